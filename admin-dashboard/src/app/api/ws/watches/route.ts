@@ -13,50 +13,21 @@ function withTimeout(ms: number) {
 
 export async function GET(req: Request) {
   try {
-    // 0) create throwaway principal (satisfy auth_principal no matter what)
-    const { signal: sSig, clear: sClr } = withTimeout(8000);
-    const sRes = await fetch(new URL("/session/anon", API), {
-      method: "POST",
-      cache: "no-store",
-      signal: sSig,
-    }).catch((e) => {
-      throw new Error(`session/anon network error: ${String(e?.message || e)}`);
-    });
-    sClr();
-    const sText = await sRes.text().catch(() => "");
-    if (!sRes.ok) {
-      return NextResponse.json(
-        { step: "session/anon", status: sRes.status, body: sText.slice(0, 600) },
-        { status: 502 }
-      );
-    }
-    let creds: { clientId: string; apiKey: string };
-    try {
-      creds = JSON.parse(sText);
-    } catch {
-      return NextResponse.json(
-        { step: "session/anon", error: "invalid JSON", body: sText.slice(0, 600) },
-        { status: 502 }
-      );
-    }
-
     // 1) build upstream
     const inUrl = new URL(req.url);
     const upstream = new URL("/admin/watches", API);
     const limit = inUrl.searchParams.get("limit");
     const cursor = inUrl.searchParams.get("cursor");
+    const fields = inUrl.searchParams.get("fields"); // e.g. "id,userId,createdAt" skips photos/signing
     if (limit) upstream.searchParams.set("limit", limit);
     if (cursor) upstream.searchParams.set("cursor", cursor);
+    if (fields) upstream.searchParams.set("fields", fields);
 
-    // 2) call FastAPI with admin+session headers
+    // 2) call FastAPI with the admin key (admin routes need no user session)
     const { signal: uSig, clear: uClr } = withTimeout(8000);
     const r = await fetch(upstream, {
       cache: "no-store",
-      headers: new Headers({
-        "x-api-key": ADMIN_KEY,
-        "X-Client-Id": String(creds.clientId),
-        Authorization: `Bearer ${String(creds.apiKey)}`,
-      }),
+      headers: new Headers({ "x-api-key": ADMIN_KEY }),
       signal: uSig,
     }).catch((e) => {
       throw new Error(`upstream /watches network error: ${String(e?.message || e)}`);
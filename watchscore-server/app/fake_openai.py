@@ -0,0 +1,94 @@
+# app/fake_openai.py
+#
+# Offline stand-in for AsyncOpenAI's streamed chat completions. Enabled with
+# OPENAI_FAKE=1; answers with a canned, schema-shaped analysis restricted to
+# the top-level keys present in the prompt, streamed in small chunks, and a
+# final usage chunk like `stream_options={"include_usage": True}` produces.
+# Every call is recorded in `calls` so routing can be checked without a key.
+
+import asyncio
+import json
+import re
+from types import SimpleNamespace
+from typing import Any, Dict, List
+
+# top-level schema keys are indented by exactly two spaces in the prompt
+_TOP_KEY_RE = re.compile(r'^  "(\w+)":', re.M)
+
+_SCORE = {"letter": "B", "numeric": 80}
+
+SAMPLE: Dict[str, Any] = {
+    "quick_facts": {"name": "Fake Diver", "subtitle": "Automatic 40mm", "movement_type": "automatic",
+                    "release_year": 2020, "list_price": {"amount": 1000, "currency": "USD"}},
+    "name": "Fake Diver",
+    "subtitle": "Automatic 40mm",
+    "overall": {"conclusion": "Offline placeholder analysis.", "score": _SCORE},
+    "brand_reputation": {"type": "microbrand", "legacy": {"value": 10, "unit": "years"}, "score": _SCORE},
+    "movement_quality": {"type": "automatic", "accuracy": {"value": 10, "unit": "sec/day"},
+                         "reliability": {"label": "high"}, "score": _SCORE},
+    "materials_build": {"total_weight": {"value": 150, "unit": "g"}, "case_material": {"material": "steel"},
+                        "crystal": {"material": "sapphire"}, "build_quality": {"label": "good"},
+                        "water_resistance": {"value": 200, "unit": "m"}, "score": _SCORE},
+    "maintenance_risks": {"service_interval": {"min": 5, "max": 7, "unit": "years"},
+                          "service_cost": {"min": 200, "max": 300, "currency": "USD"},
+                          "parts_availability": {"label": "high"}, "serviceability": {"raw": "easy"},
+                          "known_weak_points": ["—"], "score": _SCORE},
+    "value_for_money": {"list_price": {"amount": 1000, "currency": "USD"},
+                        "resale_average": {"amount": 700, "currency": "USD"},
+                        "market_liquidity": {"label": "medium"},
+                        "holding_value": {"label": "fair", "note": "—"},
+                        "value_for_wearer": {"label": "high"}, "value_for_collector": {"label": "low"},
+                        "spec_efficiency_note": {"label": "good", "note": "—"}, "score": _SCORE},
+    "alternatives": [{"model": "Other Diver", "movement": "automatic", "price": {"amount": 900, "currency": "USD"}}],
+}
+
+
+def _chunk(text: str = "", usage: Any = None) -> SimpleNamespace:
+    choices = [SimpleNamespace(delta=SimpleNamespace(content=text))] if text else []
+    return SimpleNamespace(choices=choices, usage=usage)
+
+
+class _Completions:
+    def __init__(self, owner: "FakeAsyncOpenAI"):
+        self._owner = owner
+
+    async def create(self, *, model: str, messages: List[Dict[str, Any]], stream: bool = False, **kwargs: Any):
+        prompt = ""
+        images = 0
+        for m in messages:
+            content = m.get("content")
+            if isinstance(content, str):
+                prompt += content
+                continue
+            for part in content or []:
+                if part.get("type") == "text":
+                    prompt += part["text"]
+                elif part.get("type") == "image_url":
+                    images += 1
+
+        keys = [k for k in _TOP_KEY_RE.findall(prompt) if k in SAMPLE]
+        self._owner.calls.append({"model": model, "keys": keys, "images": images})
+        body = json.dumps({k: SAMPLE[k] for k in keys}, indent=2)
+
+        # rough token counts: ~4 chars/token, plus a flat cost per image
+        usage = SimpleNamespace(
+            prompt_tokens=len(prompt) // 4 + 85 * images,
+            completion_tokens=max(1, len(body) // 4),
+        )
+        return self._stream(body, usage)
+
+    async def _stream(self, body: str, usage: Any):
+        size, delay = self._owner.chunk_size, self._owner.delay
+        for i in range(0, len(body), size):
+            if delay:
+                await asyncio.sleep(delay)
+            yield _chunk(body[i:i + size])
+        yield _chunk(usage=usage)
+
+
+class FakeAsyncOpenAI:
+    def __init__(self, chunk_size: int = 24, delay: float = 0.0):
+        self.chunk_size = chunk_size
+        self.delay = delay
+        self.calls: List[Dict[str, Any]] = []
+        self.chat = SimpleNamespace(completions=_Completions(self))
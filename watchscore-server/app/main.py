@@ -3,26 +3,43 @@ from __future__ import annotations
 
 import os
 import json
+import io
 import mimetypes
+import re
 import uuid
+import socket
 import boto3
 import time
 import asyncio, random
+import heapq
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import List, Optional, Dict, Any, TypedDict
+from collections import OrderedDict, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Optional, Dict, Any, TypedDict, Callable
 from prisma import Prisma
-from fastapi import FastAPI, HTTPException, Depends, Header, Body
+from fastapi import FastAPI, HTTPException, Depends, Header, Body, WebSocket, WebSocketDisconnect
 from fastapi.middleware.cors import CORSMiddleware
 from pydantic import BaseModel
 from prisma.engine.errors import AlreadyConnectedError, NotConnectedError
 from dotenv import load_dotenv
 from botocore.config import Config
-from fastapi.responses import StreamingResponse
-from fastapi import BackgroundTasks
-from openai import AsyncOpenAI
+from fastapi.responses import StreamingResponse, Response
+from fastapi.encoders import jsonable_encoder
+from openai import AsyncOpenAI, RateLimitError, APITimeoutError
 from fastapi import Query, Request
 import secrets, hashlib, hmac
-from datetime import datetime
+from datetime import datetime, timedelta, timezone
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # optional: photo hashing/processing is skipped without Pillow
+    Image = None  # type: ignore[assignment]
+    ImageOps = None  # type: ignore[assignment]
+try:
+    import orjson
+except ImportError:  # optional: stdlib json + jsonable_encoder without it
+    orjson = None  # type: ignore[assignment]
 
 # -----------------------------------------------------------------------------
 # Env & setup
@@ -32,7 +49,7 @@ load_dotenv(ROOT / ".env")
 
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
 # Use a VISION-CAPABLE model by default
-AI_MODEL = "gpt-4.1"
+AI_MODEL = os.getenv("AI_MODEL", "gpt-4.1")
 
 # S3 (leave unset to use local /uploads dev fallback)
 AWS_ACCESS_KEY_ID = os.getenv("AWS_ACCESS_KEY_ID")
@@ -59,8 +76,134 @@ s3 = (
     else None
 )
 
-oclient = AsyncOpenAI()            # reuse one async client
-OAI_SEM = asyncio.Semaphore(10)
+# "sections": one AnalysisSection row per key (default); "blob": legacy aiJsonStr rewrite
+ANALYSIS_STORAGE = os.getenv("ANALYSIS_STORAGE", "sections")
+
+# OPENAI_FAKE=1 swaps in a canned local stream (no key, no network)
+if os.getenv("OPENAI_FAKE") == "1":
+    from app.fake_openai import FakeAsyncOpenAI
+    oclient = FakeAsyncOpenAI(delay=float(os.getenv("OPENAI_FAKE_DELAY", "0.01")))  # type: ignore[assignment]
+else:
+    oclient = AsyncOpenAI()            # reuse one async client
+
+# -----------------------------------------------------------------------------
+# Adaptive OpenAI concurrency (AIMD)
+# -----------------------------------------------------------------------------
+# A slot is held for the whole analysis (stream creation → last chunk). The
+# window grows by ~1 per window of successes and shrinks multiplicatively on
+# 429s/timeouts or when time-to-first-token exceeds OAI_TTFT_TARGET.
+PRIORITY_INTERACTIVE = 10   # user finalize
+PRIORITY_BACKGROUND = 0     # resumes, admin re-runs
+
+class AdaptiveLimiter:
+    def __init__(self, initial: float, min_limit: float, max_limit: float,
+                 ttft_target: float, backoff: float = 0.7, cooldown: float = 5.0):
+        self.limit = float(initial)
+        self.min_limit = float(min_limit)
+        self.max_limit = float(max_limit)
+        self.ttft_target = ttft_target
+        self.backoff = backoff
+        self.cooldown = cooldown
+        self.in_flight = 0
+        self.ttft_ewma: Optional[float] = None
+        self.stats = {"acquired": 0, "overloads": 0, "slowStarts": 0, "decreases": 0}
+        self._waiters: list[tuple[int, int, asyncio.Future]] = []   # heap of (-priority, seq, fut)
+        self._seq = 0
+        self._last_decrease = 0.0
+
+    def _cap(self) -> int:
+        return max(1, int(self.limit))
+
+    def queued(self) -> int:
+        return sum(1 for _, _, f in self._waiters if not f.done())
+
+    async def acquire(self, priority: int = 0) -> None:
+        if not self.queued() and self.in_flight < self._cap():
+            self.in_flight += 1
+            self.stats["acquired"] += 1
+            return
+        fut: asyncio.Future = asyncio.get_running_loop().create_future()
+        heapq.heappush(self._waiters, (-priority, self._seq, fut))
+        self._seq += 1
+        try:
+            await fut
+        except asyncio.CancelledError:
+            if fut.done() and not fut.cancelled():
+                # granted right before cancellation → give the slot back
+                self.release()
+            raise
+        self.stats["acquired"] += 1
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._wake()
+
+    def _wake(self) -> None:
+        while self._waiters and self.in_flight < self._cap():
+            _, _, fut = heapq.heappop(self._waiters)
+            if fut.done():
+                continue
+            self.in_flight += 1
+            fut.set_result(None)
+
+    def on_success(self) -> None:
+        self.limit = min(self.max_limit, self.limit + 1.0 / self.limit)
+        self._wake()
+
+    def _decrease(self) -> None:
+        now = time.monotonic()
+        if now - self._last_decrease < self.cooldown:
+            return   # one cut per congestion episode
+        self._last_decrease = now
+        self.limit = max(self.min_limit, self.limit * self.backoff)
+        self.stats["decreases"] += 1
+
+    def on_overload(self) -> None:
+        self.stats["overloads"] += 1
+        self._decrease()
+
+    def observe_ttft(self, seconds: float) -> None:
+        self.ttft_ewma = seconds if self.ttft_ewma is None else 0.8 * self.ttft_ewma + 0.2 * seconds
+        if seconds > self.ttft_target:
+            self.stats["slowStarts"] += 1
+            self._decrease()
+
+    @asynccontextmanager
+    async def slot(self, priority: int = 0):
+        await self.acquire(priority)
+        ok = False
+        try:
+            yield self
+            ok = True
+        except Exception as e:
+            if _is_overload(e):
+                self.on_overload()
+            raise
+        finally:
+            self.release()
+            if ok:
+                self.on_success()
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "limit": round(self.limit, 2),
+            "inFlight": self.in_flight,
+            "queued": self.queued(),
+            "ttftEwma": round(self.ttft_ewma, 3) if self.ttft_ewma is not None else None,
+            **self.stats,
+        }
+
+def _is_overload(e: BaseException) -> bool:
+    return isinstance(e, (RateLimitError, APITimeoutError, TimeoutError))
+
+OAI_LIMITER = AdaptiveLimiter(
+    initial=float(os.getenv("OAI_LIMIT_INITIAL", "8")),
+    min_limit=float(os.getenv("OAI_LIMIT_MIN", "1")),
+    max_limit=float(os.getenv("OAI_LIMIT_MAX", "32")),
+    ttft_target=float(os.getenv("OAI_TTFT_TARGET", "8")),
+)
+# a stream silent this long is abandoned (it holds a limiter slot and a job slot)
+OAI_STREAM_IDLE_SECS = float(os.getenv("OAI_STREAM_IDLE_SECS", "45"))
 
 
 def _hash_api_key(raw: str) -> str:
@@ -73,14 +216,265 @@ class Principal(TypedDict):
     user_id: int
     client_id: str
 
-WATCH_LOCKS: dict[int, asyncio.Lock] = {}
+# -----------------------------------------------------------------------------
+# In-process event bus (section/status fan-out to SSE subscribers)
+# -----------------------------------------------------------------------------
+class EventBus:
+    """Broadcast bus: every subscriber of a topic gets its own queue."""
+
+    def __init__(self, queue_size: int = 256):
+        self._subs: dict[Any, set[asyncio.Queue]] = {}
+        self._queue_size = queue_size
+
+    def subscribe(self, topic: Any, q: Optional[asyncio.Queue] = None) -> asyncio.Queue:
+        """Pass `q` to fan several topics into one queue (e.g. a websocket's send queue)."""
+        if q is None:
+            q = asyncio.Queue(maxsize=self._queue_size)
+        self._subs.setdefault(topic, set()).add(q)
+        return q
+
+    def unsubscribe(self, topic: Any, q: asyncio.Queue) -> None:
+        subs = self._subs.get(topic)
+        if not subs:
+            return
+        subs.discard(q)
+        if not subs:
+            self._subs.pop(topic, None)
+
+    def publish(self, topic: Any, event: Dict[str, Any]) -> int:
+        delivered = 0
+        for q in list(self._subs.get(topic, ())):
+            try:
+                q.put_nowait(event)
+                delivered += 1
+            except asyncio.QueueFull:
+                print("[bus] subscriber queue full, dropping event for", topic)
+        return delivered
+
+    def subscriber_count(self, topic: Any) -> int:
+        return len(self._subs.get(topic, ()))
+
+BUS = EventBus()
+
+def _watch_topic(watch_id: int) -> tuple[str, int]:
+    return ("watch", watch_id)
+
+ALL_WATCHES_TOPIC = ("watch", "*")   # every watch's events (admin websocket)
+
+def _publish_watch(watch_id: int, event: Dict[str, Any], relay: bool = True) -> None:
+    _response_cache_forget([watch_id])
+    event = {**event, "watchId": watch_id}
+    BUS.publish(_watch_topic(watch_id), event)
+    BUS.publish(ALL_WATCHES_TOPIC, event)
+    if relay:
+        if event.get("type") == "section":
+            # the section is stored already; receivers read it back instead of the
+            # payload being written to SQLite a second time
+            event = {k: event[k] for k in ("type", "section", "seq")}
+        _cluster_emit("watch", {"watchId": watch_id, "event": event})
+
+def _user_topic(user_id: int) -> tuple[str, int]:
+    return ("user", user_id)
+
+# Per-user change feed: monotonic sequence bumped on watch status/section changes
+USER_FEED_SEQ: dict[int, int] = {}
+WATCH_OWNERS: dict[int, Optional[int]] = {}
+WATCH_OWNERS_MAX = 10000
+
+
+# -----------------------------------------------------------------------------
+# Per-watch locks
+# -----------------------------------------------------------------------------
+# Serialize read-modify-write of one watch (analysis merge, job enqueue).
+# Entries are refcounted and dropped when the last holder/waiter leaves, so the
+# registry only ever holds the watches being worked on right now.
+# WATCH_LOCK_MODE=lease also takes a WatchLock row in the shared SQLite DB so
+# worker processes (gunicorn -w N) exclude each other: the row is claimed by
+# an upsert that only overwrites an expired lease, and deleted on release. A
+# crashed holder blocks the watch for at most WATCH_LOCK_LEASE_SECS; critical
+# sections are a few writes, far below that, so leases aren't renewed.
+WATCH_LOCK_MODE = os.getenv("WATCH_LOCK_MODE", "local")   # "local" | "lease"
+WATCH_LOCK_LEASE_SECS = float(os.getenv("WATCH_LOCK_LEASE_SECS", "30"))
+WATCH_LOCK_WAIT_SECS = float(os.getenv("WATCH_LOCK_WAIT_SECS", "60"))
+LOCK_STATS = {"acquired": 0, "contended": 0, "peak": 0, "leaseWaits": 0, "leaseTimeouts": 0, "releaseErrors": 0}
+LOCK_OWNER = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+class _WatchLock:
+    __slots__ = ("lock", "refs")
+
+    def __init__(self):
+        self.lock = asyncio.Lock()
+        self.refs = 0
+
+WATCH_LOCKS: dict[int, _WatchLock] = {}
+
+async def _lease_acquire(watch_id: int) -> None:
+    deadline = time.monotonic() + WATCH_LOCK_WAIT_SECS
+    delay = 0.02
+    waited = False
+    while True:
+        now_ms = int(time.time() * 1000)
+        claimed = await db.execute_raw(
+            'INSERT INTO "WatchLock" ("watchId", "owner", "expiresAt") VALUES (?, ?, ?) '
+            'ON CONFLICT("watchId") DO UPDATE SET "owner" = excluded."owner", "expiresAt" = excluded."expiresAt" '
+            'WHERE "WatchLock"."expiresAt" < ?',
+            watch_id, LOCK_OWNER, now_ms + int(WATCH_LOCK_LEASE_SECS * 1000), now_ms,
+        )
+        if claimed:
+            return
+        if not waited:
+            LOCK_STATS["leaseWaits"] += 1
+            waited = True
+        if time.monotonic() >= deadline:
+            LOCK_STATS["leaseTimeouts"] += 1
+            raise TimeoutError(f"watch {watch_id} is locked by another worker")
+        await asyncio.sleep(delay)
+        delay = min(delay * 2, 0.25)
+
+async def _lease_release(watch_id: int) -> None:
+    # owner check: if our lease expired and another worker took it, leave theirs
+    try:
+        await db.execute_raw(
+            'DELETE FROM "WatchLock" WHERE "watchId" = ? AND "owner" = ?', watch_id, LOCK_OWNER,
+        )
+    except Exception as e:
+        LOCK_STATS["releaseErrors"] += 1
+        print("[locks] lease release failed:", watch_id, e)
+
+@asynccontextmanager
+async def _lock_for(watch_id: int):
+    entry = WATCH_LOCKS.get(watch_id)
+    if entry is None:
+        entry = WATCH_LOCKS[watch_id] = _WatchLock()
+        LOCK_STATS["peak"] = max(LOCK_STATS["peak"], len(WATCH_LOCKS))
+    entry.refs += 1
+    try:
+        if entry.lock.locked():
+            LOCK_STATS["contended"] += 1
+        async with entry.lock:
+            if WATCH_LOCK_MODE == "lease":
+                await _lease_acquire(watch_id)
+            LOCK_STATS["acquired"] += 1
+            try:
+                yield
+            finally:
+                if WATCH_LOCK_MODE == "lease":
+                    await _lease_release(watch_id)
+    finally:
+        entry.refs -= 1
+        if entry.refs == 0 and WATCH_LOCKS.get(watch_id) is entry:
+            del WATCH_LOCKS[watch_id]
+
+# -----------------------------------------------------------------------------
+# Cross-worker relay (multi-worker mode)
+# -----------------------------------------------------------------------------
+# The bus, the response/principal/owner caches and running job tasks live in
+# one process. With WATCH_LOCK_MODE=lease (several workers on one DB) each
+# worker also appends what the others must react to (bus events, cache
+# invalidations, session resets, job cancellations) to ClusterEvent, and tails
+# rows written by other workers every CLUSTER_POLL_SECS, replaying them
+# locally. Section events carry only {section, seq}; receivers read the stored
+# row back rather than every section payload being written twice more.
+# SQLite commits one writer at a time, so reading ids in order never
+# skips a row that commits later. Workers start tailing at the current end;
+# rows older than CLUSTER_EVENT_TTL_SECS are pruned.
+CLUSTER_RELAY = WATCH_LOCK_MODE == "lease"
+CLUSTER_POLL_SECS = float(os.getenv("CLUSTER_POLL_SECS", "0.25"))
+CLUSTER_EVENT_TTL_SECS = float(os.getenv("CLUSTER_EVENT_TTL_SECS", "300"))
+CLUSTER_PRUNE_SECS = 60.0
+CLUSTER_OUTBOX_MAX = 10000
+CLUSTER_STATS = {"sent": 0, "received": 0, "errors": 0, "flushErrors": 0, "dropped": 0}
+CLUSTER_OUTBOX: List[tuple[str, str]] = []
+CLUSTER_WAKE = asyncio.Event()
+_cluster_task: Optional[asyncio.Task] = None
+
+def _cluster_emit(kind: str, payload: Dict[str, Any]) -> None:
+    if not CLUSTER_RELAY:
+        return
+    CLUSTER_OUTBOX.append((kind, _dumps(payload).decode()))
+    CLUSTER_WAKE.set()
+
+async def _cluster_section_event(watch_id: int, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Re-attach data/raw to a relayed section event from the stored row."""
+    sec = event["section"]
+    raws, seqs, _ = await _load_analysis_seq(watch_id, only=[sec], raw=True)
+    raw = raws.get(sec)
+    if raw is None:
+        return None      # reset/deleted since
+    return {**event, "seq": seqs.get(sec) or event.get("seq", 0), "raw": raw, "data": json.loads(raw)}
+
+async def _cluster_apply(kind: str, payload: Dict[str, Any]) -> None:
+    if kind == "watch":
+        event = payload["event"]
+        if event.get("type") == "section" and "raw" not in event:
+            event = await _cluster_section_event(payload["watchId"], event)
+            if event is None:
+                return
+        _publish_watch(payload["watchId"], event, relay=False)
+    elif kind == "user":
+        _user_feed_push(payload["userId"], payload["watchId"], payload["sections"], payload["status"])
+    elif kind == "forget":
+        _invalidate_watches(payload["watchIds"], relay=False)
+    elif kind == "session_reset":
+        _forget_session(payload["clientId"], payload["userId"], relay=False)
+    elif kind == "cancel":
+        _cancel_local_jobs(payload["jobIds"])
+
+async def _cluster_flush() -> None:
+    if not CLUSTER_OUTBOX:
+        return
+    batch = CLUSTER_OUTBOX[:]
+
+    def write(b: Any) -> None:
+        for kind, payload in batch:
+            b.clusterevent.create(data={"origin": LOCK_OWNER, "kind": kind, "payload": payload})
+    try:
+        await WRITES.submit(write)
+    except Exception:
+        # kept for the next flush (new events were appended behind it); only a
+        # long outage trims the oldest, so memory stays bounded
+        CLUSTER_STATS["flushErrors"] += 1
+        overflow = len(CLUSTER_OUTBOX) - CLUSTER_OUTBOX_MAX
+        if overflow > 0:
+            del CLUSTER_OUTBOX[:overflow]
+            CLUSTER_STATS["dropped"] += overflow
+        raise
+    del CLUSTER_OUTBOX[:len(batch)]
+    CLUSTER_STATS["sent"] += len(batch)
+
+async def _cluster_loop() -> None:
+    rows = await db.query_raw('SELECT COALESCE(MAX("id"), 0) AS last FROM "ClusterEvent"')
+    last_id = int(rows[0]["last"]) if rows else 0
+    next_prune = time.monotonic() + CLUSTER_PRUNE_SECS
+    while True:
+        try:
+            await asyncio.wait_for(CLUSTER_WAKE.wait(), timeout=CLUSTER_POLL_SECS)
+        except asyncio.TimeoutError:
+            pass
+        CLUSTER_WAKE.clear()
+        try:
+            await _cluster_flush()
+            events = await db.clusterevent.find_many(
+                where={"id": {"gt": last_id}}, order={"id": "asc"}, take=500,
+            )
+            for ev in events:
+                last_id = ev.id
+                if ev.origin == LOCK_OWNER:
+                    continue
+                CLUSTER_STATS["received"] += 1
+                try:
+                    await _cluster_apply(ev.kind, json.loads(ev.payload))
+                except Exception as e:
+                    CLUSTER_STATS["errors"] += 1
+                    print("[cluster] apply failed:", ev.id, ev.kind, e)
+            if time.monotonic() >= next_prune:
+                next_prune = time.monotonic() + CLUSTER_PRUNE_SECS
+                cutoff = datetime.utcnow() - timedelta(seconds=CLUSTER_EVENT_TTL_SECS)
+                await WRITES.submit(lambda b: b.clusterevent.delete_many(where={"createdAt": {"lt": cutoff}}))
+        except Exception as e:
+            CLUSTER_STATS["errors"] += 1
+            print("[cluster] relay failed:", e)
 
-def _lock_for(watch_id: int) -> asyncio.Lock:
-    lock = WATCH_LOCKS.get(watch_id)
-    if lock is None:
-        lock = asyncio.Lock()
-        WATCH_LOCKS[watch_id] = lock
-    return lock
 # -----------------------------------------------------------------------------
 # FastAPI app
 # -----------------------------------------------------------------------------
@@ -117,6 +511,120 @@ class WatchUpdate(BaseModel):
 class FinalizePayload(BaseModel):
     photos: List[Dict[str, str]]  # [{ "key": "watches/.../photo_x.jpg" }]
 
+# -----------------------------------------------------------------------------
+# Single-writer write queue
+# -----------------------------------------------------------------------------
+# SQLite takes one writer at a time; coroutines writing directly queue up on
+# busy_timeout. Writes that don't need a result go through WRITES instead: a
+# write is a function adding operations to a Prisma batch, submit() resolves
+# once it has committed (or raises its error). The writer task commits
+# everything that arrives within WRITE_BATCH_WINDOW_MS of the first pending
+# write, up to WRITE_BATCH_MAX, as one transaction; if that transaction
+# fails, the writes are retried one by one so only the bad one fails.
+# Writes that need returned rows or counts stay direct: creates whose id is
+# used, job claims/renewals, lock leases and the DailyUser first-visit insert.
+WRITE_BATCH_WINDOW_MS = float(os.getenv("WRITE_BATCH_WINDOW_MS", "5"))
+WRITE_BATCH_MAX = int(os.getenv("WRITE_BATCH_MAX", "200"))
+
+class WriteQueue:
+    def __init__(self, window: float, max_batch: int):
+        self.window = window
+        self.max_batch = max_batch
+        self._queue: asyncio.Queue = asyncio.Queue()
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {"writes": 0, "batches": 0, "maxBatch": 0, "failed": 0, "isolated": 0,
+                      "waitMsSum": 0.0, "commitMsSum": 0.0}
+
+    def start(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Commit everything already queued, then stop the writer."""
+        if self._task is None:
+            return
+        self._queue.put_nowait(None)
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+
+    async def submit(self, write: Callable[[Any], Any]) -> None:
+        if self._task is None:
+            # no writer (startup/shutdown, scripts): commit inline
+            async with db.batch_() as batcher:
+                write(batcher)
+            return
+        fut = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((write, fut, time.perf_counter()))
+        await fut
+
+    async def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = await self._queue.get()
+            if first is None:
+                break
+            items = [first]
+            deadline = time.perf_counter() + self.window
+            while len(items) < self.max_batch:
+                timeout = deadline - time.perf_counter()
+                try:
+                    item = self._queue.get_nowait() if timeout <= 0 else await asyncio.wait_for(self._queue.get(), timeout)
+                except (asyncio.QueueEmpty, asyncio.TimeoutError):
+                    break
+                if item is None:
+                    stopping = True
+                    break
+                items.append(item)
+            await self._commit(items)
+
+    async def _commit(self, items: List[tuple[Callable[[Any], Any], asyncio.Future, float]]) -> None:
+        t0 = time.perf_counter()
+        errors: List[Optional[BaseException]] = [None] * len(items)
+        try:
+            async with db.batch_() as batcher:
+                for write, _, _ in items:
+                    write(batcher)
+        except Exception as e:
+            if len(items) == 1:
+                errors[0] = e
+            else:
+                self.stats["isolated"] += 1
+                for i, (write, _, _) in enumerate(items):
+                    try:
+                        async with db.batch_() as batcher:
+                            write(batcher)
+                    except Exception as e1:
+                        errors[i] = e1
+
+        st = self.stats
+        st["batches"] += 1
+        st["writes"] += len(items)
+        st["maxBatch"] = max(st["maxBatch"], len(items))
+        st["commitMsSum"] += (time.perf_counter() - t0) * 1000
+        for (_, fut, queued_at), err in zip(items, errors):
+            st["waitMsSum"] += (t0 - queued_at) * 1000
+            if err is not None:
+                st["failed"] += 1
+            if fut.done():      # caller went away; the write still happened
+                continue
+            if err is None:
+                fut.set_result(None)
+            else:
+                fut.set_exception(err)
+
+    def snapshot(self) -> Dict[str, Any]:
+        st = self.stats
+        return {
+            **{k: v for k, v in st.items() if not k.endswith("Sum")},
+            "queueDepth": self._queue.qsize(),
+            "windowMs": self.window * 1000,
+            "avgBatch": round(st["writes"] / st["batches"], 2) if st["batches"] else None,
+            "avgQueueMs": round(st["waitMsSum"] / st["writes"], 2) if st["writes"] else None,
+            "avgCommitMs": round(st["commitMsSum"] / st["batches"], 2) if st["batches"] else None,
+        }
+
+WRITES = WriteQueue(WRITE_BATCH_WINDOW_MS / 1000, WRITE_BATCH_MAX)
+
 # -----------------------------------------------------------------------------
 # Server Lifecycle
 # -----------------------------------------------------------------------------
@@ -134,6 +642,27 @@ async def on_startup():
     except AlreadyConnectedError:
         pass
 
+    WRITES.start()
+
+    global _heartbeat_task, _dispatcher_task, _cluster_task
+    if CLUSTER_RELAY and _cluster_task is None:
+        _cluster_task = asyncio.create_task(_cluster_loop())
+    if _heartbeat_task is None:
+        _heartbeat_task = asyncio.create_task(_heartbeat_loop())
+
+    if NEAR_DUP_MODE != "off" and Image is not None:
+        try:
+            print("[startup] near-dup index:", await _build_photo_index(), "photos")
+        except Exception as e:
+            print("[startup] near-dup index build failed:", e)
+
+    try:
+        await _resume_stale_watches()
+    except Exception as e:
+        print("[startup] resume stale watches failed:", e)
+    if _dispatcher_task is None:
+        _dispatcher_task = asyncio.create_task(_job_dispatcher())
+
     if S3_ENABLED and boto3:
         try:
             sts = boto3.client("sts", region_name=AWS_REGION)  # type: ignore
@@ -145,6 +674,32 @@ async def on_startup():
 
 @app.on_event("shutdown")
 async def on_shutdown():
+    global _heartbeat_task, _dispatcher_task
+    if _heartbeat_task is not None:
+        _heartbeat_task.cancel()
+        _heartbeat_task = None
+    if _dispatcher_task is not None:
+        _dispatcher_task.cancel()
+        _dispatcher_task = None
+    # running jobs requeue themselves on cancel
+    for t in list(JOB_TASKS):
+        t.cancel()
+    await asyncio.gather(*JOB_TASKS, return_exceptions=True)
+    if _preprocess_pool is not None:
+        _preprocess_pool.shutdown(wait=False, cancel_futures=True)
+    try:
+        await _flush_heartbeats()
+    except Exception:
+        pass
+    global _cluster_task
+    if _cluster_task is not None:
+        _cluster_task.cancel()
+        _cluster_task = None
+        try:
+            await _cluster_flush()
+        except Exception:
+            pass
+    await WRITES.stop()
     try:
         await db.disconnect()
     except NotConnectedError:
@@ -189,14 +744,129 @@ def _serialize_watch(record: Any) -> Dict[str, Any]:
         ],
     }
 
+# Signed GET URLs are cached so repeated list/detail calls return the *same*
+# URL (client image caches hit) and skip SigV4 signing. Each URL is signed for
+# 2x the requested lifetime and reused while at least `expires` seconds remain.
+PRESIGN_CACHE_MAX = int(os.getenv("PRESIGN_CACHE_MAX", "5000"))
+PRESIGN_CACHE: "OrderedDict[tuple[str, int], tuple[float, str]]" = OrderedDict()
+PRESIGN_STATS = {"hits": 0, "misses": 0, "evictions": 0}
+
 def _presign_get(key: str, expires: int = 300) -> str:
     if not (S3_ENABLED and s3 and AWS_S3_BUCKET):
         raise RuntimeError("S3 not configured")
-    return s3.generate_presigned_url(  # type: ignore[union-attr]
+
+    now = time.time()
+    cache_key = (key, expires)
+    hit = PRESIGN_CACHE.get(cache_key)
+    if hit is not None:
+        valid_until, url = hit
+        if valid_until - now >= expires:
+            PRESIGN_CACHE.move_to_end(cache_key)
+            PRESIGN_STATS["hits"] += 1
+            return url
+        PRESIGN_CACHE.pop(cache_key, None)
+
+    PRESIGN_STATS["misses"] += 1
+    url = s3.generate_presigned_url(  # type: ignore[union-attr]
         ClientMethod="get_object",
         Params={"Bucket": AWS_S3_BUCKET, "Key": key},
-        ExpiresIn=expires,
+        ExpiresIn=expires * 2,
     )
+    PRESIGN_CACHE[cache_key] = (now + expires * 2, url)
+    while len(PRESIGN_CACHE) > PRESIGN_CACHE_MAX:
+        PRESIGN_CACHE.popitem(last=False)
+        PRESIGN_STATS["evictions"] += 1
+    return url
+
+def _presign_forget(keys: List[str]) -> None:
+    drop = set(keys)
+    for ck in [ck for ck in PRESIGN_CACHE if ck[0] in drop]:
+        PRESIGN_CACHE.pop(ck, None)
+
+# -----------------------------------------------------------------------------
+# Conditional GET (ETag / If-None-Match) + rendered-response cache
+# -----------------------------------------------------------------------------
+# ETags hash what a response is built from (watch updatedAt, analysis seq,
+# photo rows) plus a URL epoch: presigned URLs handed out stay valid for at
+# least `expires`, so a body rendered in an epoch of expires/2 can be replayed
+# or 304'd until the epoch ends without serving an expired link. Rendered
+# bodies of complete watches are kept in RESPONSE_CACHE and dropped on any
+# change to the watch (_response_cache_forget).
+RESPONSE_CACHE_MAX = int(os.getenv("RESPONSE_CACHE_MAX", "2000"))
+RESPONSE_CACHE: "OrderedDict[tuple[str, int], tuple[str, bytes, int]]" = OrderedDict()
+RESPONSE_STATS = {"hits": 0, "misses": 0, "notModified": 0, "invalidations": 0}
+
+def _url_epoch(expires: int) -> int:
+    return int(time.time() // max(1, expires // 2))
+
+def _etag(*parts: Any) -> str:
+    return '"' + hashlib.sha1("|".join(map(str, parts)).encode()).hexdigest()[:24] + '"'
+
+def _not_modified(request: Request, etag: str) -> bool:
+    inm = request.headers.get("if-none-match")
+    if not inm:
+        return False
+    tags = {t.strip().removeprefix("W/") for t in inm.split(",")}
+    return "*" in tags or etag in tags
+
+def _dumps(obj: Any) -> bytes:
+    """orjson when installed (handles datetimes natively); else what FastAPI's JSONResponse does."""
+    if orjson is not None:
+        try:
+            return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+        except TypeError:
+            pass
+    return json.dumps(jsonable_encoder(obj), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+def _render_json(obj: Any, raw: Optional[Dict[str, bytes]] = None) -> bytes:
+    """Encode `obj`; `raw` values are already-encoded JSON spliced in as extra top-level keys."""
+    body = _dumps(obj)
+    if not raw:
+        return body
+    extra = b",".join(_dumps(k) + b":" + v for k, v in raw.items())
+    return body[:-1] + (b"," if len(body) > 2 else b"") + extra + b"}"
+
+def _etag_response(request: Request, etag: str, body: bytes) -> Response:
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if _not_modified(request, etag):
+        RESPONSE_STATS["notModified"] += 1
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
+
+def _response_cache_get(key: tuple[str, int], epoch: int) -> Optional[tuple[str, bytes]]:
+    hit = RESPONSE_CACHE.get(key)
+    if hit is None or hit[2] != epoch:
+        if hit is not None:
+            RESPONSE_CACHE.pop(key, None)
+        RESPONSE_STATS["misses"] += 1
+        return None
+    RESPONSE_CACHE.move_to_end(key)
+    RESPONSE_STATS["hits"] += 1
+    return hit[0], hit[1]
+
+def _response_cache_put(key: tuple[str, int], etag: str, body: bytes, epoch: int) -> None:
+    RESPONSE_CACHE[key] = (etag, body, epoch)
+    RESPONSE_CACHE.move_to_end(key)
+    while len(RESPONSE_CACHE) > RESPONSE_CACHE_MAX:
+        RESPONSE_CACHE.popitem(last=False)
+
+def _response_cache_forget(watch_ids: Any) -> None:
+    for watch_id in watch_ids:
+        for route in ("watch", "admin_watch"):
+            if RESPONSE_CACHE.pop((route, watch_id), None) is not None:
+                RESPONSE_STATS["invalidations"] += 1
+
+def _invalidate_watches(watch_ids: Any, relay: bool = True) -> None:
+    """Drop cached bodies and owners of changed/deleted watches (in every worker)."""
+    ids = list(watch_ids)
+    _response_cache_forget(ids)
+    for watch_id in ids:
+        WATCH_OWNERS.pop(watch_id, None)
+    if relay and ids:
+        _cluster_emit("forget", {"watchIds": ids})
+
+def _photos_tag(photos: Any) -> str:
+    return ",".join(f"{p.id}:{p.key}:{p.index}:{getattr(p, 'thumbSizes', None)}" for p in photos or [])
 
 def _presign_put(key: str, content_type: str, expires: int = 900) -> str:
     if not (S3_ENABLED and s3 and AWS_S3_BUCKET):
@@ -214,9 +884,94 @@ def _presign_put(key: str, content_type: str, expires: int = 900) -> str:
         ExpiresIn=expires,
     )
 
+# -----------------------------------------------------------------------------
+# Principal cache + batched heartbeats
+# -----------------------------------------------------------------------------
+# Resolved principals are cached per (clientId, sha256(token)) so polling
+# clients don't hit the DB on every request. lastSeenAt is no longer written
+# on the read path; heartbeats are coalesced here and flushed in one batch.
+PRINCIPAL_CACHE_TTL = float(os.getenv("PRINCIPAL_CACHE_TTL", "60"))      # seconds
+PRINCIPAL_CACHE_MAX = int(os.getenv("PRINCIPAL_CACHE_MAX", "10000"))
+HEARTBEAT_FLUSH_SECS = float(os.getenv("HEARTBEAT_FLUSH_SECS", "30"))
+
+PRINCIPAL_CACHE: dict[tuple[str, str], tuple[float, Principal]] = {}
+PENDING_HEARTBEATS: dict[int, datetime] = {}
+_heartbeat_task: Optional[asyncio.Task] = None
+
+def _principal_cache_get(key: tuple[str, str]) -> Optional[Principal]:
+    hit = PRINCIPAL_CACHE.get(key)
+    if hit is None:
+        return None
+    expires_at, principal = hit
+    if expires_at < time.monotonic():
+        PRINCIPAL_CACHE.pop(key, None)
+        return None
+    return principal
+
+def _principal_cache_put(key: tuple[str, str], principal: Principal) -> None:
+    if len(PRINCIPAL_CACHE) >= PRINCIPAL_CACHE_MAX:
+        now = time.monotonic()
+        for k in [k for k, (exp, _) in PRINCIPAL_CACHE.items() if exp < now]:
+            PRINCIPAL_CACHE.pop(k, None)
+        # still full → drop oldest inserted entries
+        while len(PRINCIPAL_CACHE) >= PRINCIPAL_CACHE_MAX:
+            PRINCIPAL_CACHE.pop(next(iter(PRINCIPAL_CACHE)), None)
+    PRINCIPAL_CACHE[key] = (time.monotonic() + PRINCIPAL_CACHE_TTL, principal)
+
+def _principal_cache_invalidate(client_id: str) -> None:
+    for k in [k for k in PRINCIPAL_CACHE if k[0] == client_id]:
+        PRINCIPAL_CACHE.pop(k, None)
+
+def _forget_session(client_id: str, user_id: int, relay: bool = True) -> None:
+    """A reset session: stop authorizing it and drop per-user state (in every worker)."""
+    _principal_cache_invalidate(client_id)
+    PENDING_HEARTBEATS.pop(user_id, None)
+    USER_FEED_SEQ.pop(user_id, None)
+    if relay:
+        _cluster_emit("session_reset", {"clientId": client_id, "userId": user_id})
+
+async def _flush_heartbeats() -> int:
+    if not PENDING_HEARTBEATS:
+        return 0
+    pending = dict(PENDING_HEARTBEATS)
+    PENDING_HEARTBEATS.clear()
+    try:
+        # one write; update_many so a deleted user doesn't abort the batch
+        def write(batcher: Any) -> None:
+            for user_id, seen_at in pending.items():
+                batcher.user.update_many(where={"id": user_id}, data={"lastSeenAt": seen_at})
+        await WRITES.submit(write)
+    except Exception as e:
+        print("[heartbeat] flush failed:", e)
+        # keep the newest timestamp for the next attempt
+        for user_id, seen_at in pending.items():
+            PENDING_HEARTBEATS.setdefault(user_id, seen_at)
+        return 0
+    return len(pending)
+
+async def _heartbeat_loop() -> None:
+    while True:
+        await asyncio.sleep(HEARTBEAT_FLUSH_SECS)
+        await _flush_heartbeats()
+
 # -----------------------------------------------------------------------------
 # APP Prompt builder
 # -----------------------------------------------------------------------------
+async def _resolve_principal(client_id: str, api_key: str) -> Optional[Principal]:
+    token_hash = _hash_api_key(api_key)
+    cache_key = (client_id, token_hash)
+    principal = _principal_cache_get(cache_key)
+    if principal is None:
+        user = await db.user.find_unique(where={"clientId": client_id})
+        if not user or not _ct_eq(user.apiKeyHash, token_hash):
+            return None
+        principal = {"user_id": user.id, "client_id": user.clientId}
+        _principal_cache_put(cache_key, principal)
+
+    # heartbeat is coalesced and written by _heartbeat_loop
+    PENDING_HEARTBEATS[principal["user_id"]] = datetime.utcnow()
+    return principal
+
 async def auth_principal(
     x_client_id: str = Header(..., alias="X-Client-Id"),
     authorization: str = Header(..., alias="Authorization"),
@@ -224,19 +979,10 @@ async def auth_principal(
     parts = authorization.split()
     if len(parts) != 2 or parts[0].lower() != "bearer":
         raise HTTPException(401, "invalid auth")
-    token = parts[1]
-
-    user = await db.user.find_unique(where={"clientId": x_client_id})
-    if not user or not _ct_eq(user.apiKeyHash, _hash_api_key(token)):
+    principal = await _resolve_principal(x_client_id, parts[1])
+    if principal is None:
         raise HTTPException(401, "unauthorized")
-
-    # optional heartbeat
-    try:
-        await db.user.update(where={"id": user.id}, data={"lastSeenAt": datetime.utcnow()})
-    except Exception:
-        pass
-
-    return {"user_id": user.id, "client_id": user.clientId}
+    return principal
 
 
 @app.post("/session/anon")
@@ -252,28 +998,31 @@ async def create_anon_session():
 
 
 # -----------------------------------------------------------------------------
-def build_ai_prompt() -> str:
-    return (
-        "You are a watch expert. Analyze the provided photos and return a STRICT JSON with the exact schema below.\n"
-        "Return ONLY JSON (no commentary). If unsure about any field, use the string \"—\" or numeric 0. Be realistic and consistent.\n"
-        "\n"
-        "SCORING RULES (apply to ALL \"score\" objects):\n"
-        "- score.numeric MUST be an INTEGER in the range 0–100 (not a string).\n"
-        "- Allowed letters (best→worst): A, B, C, D.\n"
-        "- Map numeric→letter using bins: A: 90–100, B: 75–89, C: 60–74, D: 0–59.\n"
-        "- score.letter MUST match the bin containing score.numeric.\n"
-        "- If a numeric would fall outside 0–100, clamp it to 0 or 100 BEFORE setting the letter.\n"
-        "- Do NOT use any +/- modifiers for letters.\n"
-        "\n"
-        "FIELD CONSTRAINTS:\n"
-        "- brand_reputation.type: 1–2 words, lowercase (e.g., \"horology\", \"microbrand\").\n"
-        "- brand_reputation.legacy: ONLY value (number) and unit (\"years\").\n"
-        "- movement_quality.type: ONE word (e.g., \"automatic\", \"manual\", \"quartz\", \"spring-drive\").\n"
-        "- movement_quality.reliability.label: one of {\"very low\",\"low\",\"medium\",\"high\",\"very high\"}.\n"
-        "- Keep all other units as specified (e.g., sec/day, g, m, USD). Do NOT add extra keys. Fill every field.\n"
-        "- Arrays must be present; if unknown, put a single placeholder like [\"—\"].\n"
-        "\n"
-        "{\n"
+PROMPT_RULES = (
+    "You are a watch expert. Analyze the provided photos and return a STRICT JSON with the exact schema below.\n"
+    "Return ONLY JSON (no commentary). If unsure about any field, use the string \"—\" or numeric 0. Be realistic and consistent.\n"
+    "\n"
+    "SCORING RULES (apply to ALL \"score\" objects):\n"
+    "- score.numeric MUST be an INTEGER in the range 0–100 (not a string).\n"
+    "- Allowed letters (best→worst): A, B, C, D.\n"
+    "- Map numeric→letter using bins: A: 90–100, B: 75–89, C: 60–74, D: 0–59.\n"
+    "- score.letter MUST match the bin containing score.numeric.\n"
+    "- If a numeric would fall outside 0–100, clamp it to 0 or 100 BEFORE setting the letter.\n"
+    "- Do NOT use any +/- modifiers for letters.\n"
+    "\n"
+    "FIELD CONSTRAINTS:\n"
+    "- brand_reputation.type: 1–2 words, lowercase (e.g., \"horology\", \"microbrand\").\n"
+    "- brand_reputation.legacy: ONLY value (number) and unit (\"years\").\n"
+    "- movement_quality.type: ONE word (e.g., \"automatic\", \"manual\", \"quartz\", \"spring-drive\").\n"
+    "- movement_quality.reliability.label: one of {\"very low\",\"low\",\"medium\",\"high\",\"very high\"}.\n"
+    "- Keep all other units as specified (e.g., sec/day, g, m, USD). Do NOT add extra keys. Fill every field.\n"
+    "- Arrays must be present; if unknown, put a single placeholder like [\"—\"].\n"
+    "\n"
+)
+
+# Schema block per top-level key, in prompt order
+PROMPT_SCHEMA: Dict[str, str] = {
+    "quick_facts": (
         "  \"quick_facts\": {\n"
         "    \"name\": \"string\",\n"
         "    \"subtitle\": \"string\",\n"
@@ -281,23 +1030,31 @@ def build_ai_prompt() -> str:
         "    \"release_year\": 0,\n"
         "    \"list_price\": { \"amount\": 0, \"currency\": \"USD\" }\n"
         "  },\n"
-        "  \"name\": \"string\",\n"
-        "  \"subtitle\": \"string\",\n"
+    ),
+    "name": "  \"name\": \"string\",\n",
+    "subtitle": "  \"subtitle\": \"string\",\n",
+    "overall": (
         "  \"overall\": {\n"
         "    \"conclusion\": \"string\",\n"
         "    \"score\": { \"letter\": \"A|B|C|D\", \"numeric\": 0 }\n"
         "  },\n"
+    ),
+    "brand_reputation": (
         "  \"brand_reputation\": {\n"
         "    \"type\": \"string\",\n"
         "    \"legacy\": { \"value\": 0, \"unit\": \"years\" },\n"
         "    \"score\": { \"letter\": \"A|B|C|D\", \"numeric\": 0 }\n"
         "  },\n"
+    ),
+    "movement_quality": (
         "  \"movement_quality\": {\n"
         "    \"type\": \"string\",\n"
         "    \"accuracy\": { \"value\": 0, \"unit\": \"sec/day\"},\n"
         "    \"reliability\": { \"label\": \"string\"},\n"
         "    \"score\": { \"letter\": \"A|B|C|D\", \"numeric\": 0 }\n"
         "  },\n"
+    ),
+    "materials_build": (
         "  \"materials_build\": {\n"
         "    \"total_weight\": { \"value\": 0, \"unit\": \"g\"},\n"
         "    \"case_material\": {\"material\": \"string\"},\n"
@@ -306,6 +1063,8 @@ def build_ai_prompt() -> str:
         "    \"water_resistance\": { \"value\": 0, \"unit\": \"m\"},\n"
         "    \"score\": { \"letter\": \"A|B|C|D\", \"numeric\": 0 }\n"
         "  },\n"
+    ),
+    "maintenance_risks": (
         "  \"maintenance_risks\": {\n"
         "    \"service_interval\": { \"min\": 0, \"max\": 0, \"unit\": \"y\"},\n"
         "    \"service_cost\": { \"min\": 0, \"max\": 0, \"currency\": \"USD\"},\n"
@@ -314,6 +1073,8 @@ def build_ai_prompt() -> str:
         "    \"known_weak_points\": [\"string\"],\n"
         "    \"score\": { \"letter\": \"A|B|C|D\", \"numeric\": 0 }\n"
         "  },\n"
+    ),
+    "value_for_money": (
         "  \"value_for_money\": {\n"
         "    \"list_price\": { \"amount\": 0, \"currency\": \"USD\"},\n"
         "    \"resale_average\": { \"amount\": 0, \"currency\": \"USD\"},\n"
@@ -324,11 +1085,18 @@ def build_ai_prompt() -> str:
         "    \"spec_efficiency_note\": { \"label\": \"string\", \"note\": \"string\" },\n"
         "    \"score\": { \"letter\": \"A|B|C|D\", \"numeric\": 0 }\n"
         "  },\n"
+    ),
+    "alternatives": (
         "  \"alternatives\": [\n"
         "    { \"model\": \"string\", \"movement\": \"string\", \"price\": { \"amount\": 0, \"currency\": \"USD\"} }\n"
         "  ],\n"
-        "}\n"
-    )
+    ),
+}
+
+def build_ai_prompt(keys: Optional[List[str]] = None) -> str:
+    """Full prompt by default; `keys` restricts the schema to those top-level keys."""
+    wanted = PROMPT_SCHEMA.keys() if keys is None else [k for k in PROMPT_SCHEMA if k in keys]
+    return PROMPT_RULES + "{\n" + "".join(PROMPT_SCHEMA[k] for k in wanted) + "}\n"
 
 SECTIONS = [
     "quick_facts", "overall", "brand_reputation", "movement_quality",
@@ -338,85 +1106,472 @@ SECTIONS = [
 def _section_count(obj: Dict[str, Any]) -> int:
     return sum(1 for s in SECTIONS if s in obj)
 
-async def _merge_analysis_json(watch_id: int, fragment: Dict[str, Any]) -> None:
-    async with _lock_for(watch_id):                      # <-- swap in
-        existing = await db.watchanalysis.find_unique(where={"watchId": watch_id})
-        base: Dict[str, Any] = {}
-        if existing and getattr(existing, "aiJsonStr", None):
-            try:
-                base = json.loads(existing.aiJsonStr)
-            except Exception:
-                base = {}
+def _summary_fields(obj: Dict[str, Any]) -> Dict[str, Any]:
+    """Denormalized Watch columns derivable from (part of) an analysis."""
+    out: Dict[str, Any] = {}
+    qf = obj.get("quick_facts") if isinstance(obj.get("quick_facts"), dict) else {}
+    vfm = obj.get("value_for_money") if isinstance(obj.get("value_for_money"), dict) else {}
+    overall = obj.get("overall") if isinstance(obj.get("overall"), dict) else {}
+
+    name = obj.get("name") or qf.get("name")
+    if isinstance(name, str) and name:
+        out["name"] = name
+    subtitle = obj.get("subtitle") or qf.get("subtitle")
+    if isinstance(subtitle, str) and subtitle:
+        out["subtitle"] = subtitle
+    y = qf.get("release_year")
+    if isinstance(y, int) and not isinstance(y, bool):
+        out["year"] = y
+
+    sc = overall.get("score") or {}
+    if isinstance(sc, dict):
+        if isinstance(sc.get("letter"), str):
+            out["overallLetter"] = sc["letter"]
+        if isinstance(sc.get("numeric"), (int, float)):
+            out["overallNumeric"] = int(round(sc["numeric"]))
+
+    lp = vfm.get("list_price") or qf.get("list_price") or {}
+    if isinstance(lp, dict):
+        if isinstance(lp.get("amount"), (int, float)):
+            out["priceAmount"] = float(lp["amount"])
+        if isinstance(lp.get("currency"), str):
+            out["priceCurrency"] = lp["currency"]
+    return out
 
-        base.update(fragment)
-        payload_str = json.dumps(base, ensure_ascii=False)
-        sections = _section_count(base)
+def _analysis_obj(wa: Any, rows: Any = None, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    """Assemble the analysis dict from a legacy blob and/or AnalysisSection rows."""
+    obj: Dict[str, Any] = {}
+    if wa and getattr(wa, "aiJsonStr", None):
+        try:
+            obj = json.loads(wa.aiJsonStr)
+        except Exception:
+            obj = {}
+        if not isinstance(obj, dict):
+            obj = {}
+    for r in rows or []:
+        if only is not None and r.section not in only:
+            continue
+        try:
+            obj[r.section] = json.loads(r.dataStr)
+        except Exception:
+            pass
+    return obj
 
-        if existing:
-            await db.watchanalysis.update(
-                where={"watchId": watch_id},
-                data={"aiJsonStr": payload_str, "sections": sections},
-            )
+# stored JSON that _analysis_obj callers treat as "no data yet"
+_EMPTY_JSON = {"{}", "[]", "null", '""'}
+
+def _reject_constant(name: str) -> Any:
+    raise ValueError(f"non-standard JSON constant {name}")
+
+def _json_ok(text: str) -> bool:
+    """Parse-only check of stored JSON text before it is spliced into a response."""
+    try:
+        if orjson is not None:
+            orjson.loads(text)
         else:
-            await db.watchanalysis.create(
-                data={"watchId": watch_id, "aiJsonStr": payload_str, "sections": sections},
+            json.loads(text, parse_constant=_reject_constant)   # NaN/Infinity aren't JSON
+        return True
+    except Exception:
+        return False
+
+def _analysis_raw_sections(wa: Any, rows: Any = None, only: Optional[List[str]] = None) -> Dict[str, str]:
+    """
+    Like _analysis_obj, but each value is the stored JSON text (validated, not
+    re-encoded). A corrupt row is skipped, as _analysis_obj skips it.
+    """
+    if wa and getattr(wa, "aiJsonStr", None):
+        # legacy blob: has to be parsed once to split it
+        return {k: _dumps(v).decode() for k, v in _analysis_obj(wa, rows, only).items()}
+    out: Dict[str, str] = {}
+    for r in rows or []:
+        if only is not None and r.section not in only:
+            continue
+        if _json_ok(r.dataStr):
+            out[r.section] = r.dataStr
+        else:
+            print("[analysis] skipping corrupt section JSON:", r.section)
+    return out
+
+def _analysis_raw(wa: Any, rows: Any = None) -> bytes:
+    """The whole analysis as JSON bytes, spliced from stored text without a re-encode."""
+    if wa and getattr(wa, "aiJsonStr", None) and not rows:
+        blob = wa.aiJsonStr
+        if blob.lstrip().startswith("{") and _json_ok(blob):
+            return blob.encode()
+        print("[analysis] corrupt analysis blob, serving {}")
+        return b"{}"
+    parts = _analysis_raw_sections(wa, rows)
+    return b"{" + b",".join(_dumps(k) + b":" + v.encode() for k, v in parts.items()) + b"}"
+
+async def _load_analysis(watch_id: int, only: Optional[List[str]] = None) -> Dict[str, Any]:
+    wa = await db.watchanalysis.find_unique(where={"watchId": watch_id})
+    if wa is None:
+        return {}
+    rows = []
+    if not wa.aiJsonStr:
+        where: Dict[str, Any] = {"watchId": watch_id}
+        if only is not None:
+            where["section"] = {"in": only}
+        rows = await db.analysissection.find_many(where=where)
+    return _analysis_obj(wa, rows, only)
+
+async def _load_analysis_seq(
+    watch_id: int, only: Optional[List[str]] = None, raw: bool = False,
+) -> tuple[Dict[str, Any], Dict[str, int], int]:
+    """
+    _load_analysis plus each section's sequence number and the watch's last
+    one. A legacy blob has no per-section seq, so its sections come back as 0.
+    raw=True returns each section's stored JSON text instead of parsing it.
+    """
+    wa = await db.watchanalysis.find_unique(where={"watchId": watch_id})
+    if wa is None:
+        return {}, {}, 0
+    rows = []
+    if not wa.aiJsonStr:
+        where: Dict[str, Any] = {"watchId": watch_id}
+        if only is not None:
+            where["section"] = {"in": only}
+        rows = await db.analysissection.find_many(where=where)
+    seqs = {r.section: r.seq for r in rows}
+    if raw:
+        return _analysis_raw_sections(wa, rows, only), seqs, wa.seq
+    return _analysis_obj(wa, rows, only), seqs, wa.seq
+
+async def _watch_owner(watch_id: int) -> Optional[int]:
+    if watch_id in WATCH_OWNERS:
+        return WATCH_OWNERS[watch_id]
+    w = await db.watch.find_unique(where={"id": watch_id})
+    owner = w.userId if w else None
+    if len(WATCH_OWNERS) >= WATCH_OWNERS_MAX:
+        WATCH_OWNERS.pop(next(iter(WATCH_OWNERS)), None)
+    WATCH_OWNERS[watch_id] = owner
+    return owner
+
+async def _publish_user_change(watch_id: int, status: str, sections: Optional[int] = None) -> None:
+    """Bump the owner's feed sequence and push a delta to /watches/stream."""
+    try:
+        user_id = await _watch_owner(watch_id)
+        if user_id is None:
+            return
+        if sections is None:
+            w = await db.watch.find_unique(where={"id": watch_id})
+            sections = w.sections if w else 0
+    except Exception as e:
+        print("[feed] publish failed:", watch_id, e)
+        return
+    _user_feed_push(user_id, watch_id, sections, status)
+    _cluster_emit("user", {"userId": user_id, "watchId": watch_id, "sections": sections, "status": status})
+
+def _user_feed_push(user_id: int, watch_id: int, sections: int, status: str) -> None:
+    # seq is per worker: a feed client only ever sees the worker it's connected to
+    seq = USER_FEED_SEQ.get(user_id, 0) + 1
+    USER_FEED_SEQ[user_id] = seq
+    BUS.publish(_user_topic(user_id), {
+        "type": "watch", "seq": seq, "watchId": watch_id, "sections": sections, "status": status,
+    })
+
+async def _store_blob(watch_id: int, fragment: Dict[str, Any]) -> tuple[int, int, Dict[str, int]]:
+    """Legacy mode: read-modify-write of the whole aiJsonStr blob."""
+    existing = await db.watchanalysis.find_unique(where={"watchId": watch_id})
+    base: Dict[str, Any] = {}
+    if existing and getattr(existing, "aiJsonStr", None):
+        try:
+            base = json.loads(existing.aiJsonStr)
+        except Exception:
+            base = {}
+
+    base.update(fragment)
+    payload_str = json.dumps(base, ensure_ascii=False)
+    sections = _section_count(base)
+    prev_sections = existing.sections if existing else 0
+    last_seq = existing.seq if existing else 0
+    seqs = {key: last_seq + i for i, key in enumerate(fragment, 1)}
+    last_seq += len(fragment)
+
+    data = {"aiJsonStr": payload_str, "sections": sections, "seq": last_seq}
+    await WRITES.submit(lambda b: b.watchanalysis.upsert(
+        where={"watchId": watch_id},
+        data={"create": {"watchId": watch_id, **data}, "update": data},
+    ))
+    return sections, prev_sections, seqs
+
+async def _store_sections(watch_id: int, fragment: Dict[str, Any]) -> tuple[int, int, Dict[str, int]]:
+    """
+    Sections mode: one AnalysisSection row per key; WatchAnalysis keeps the
+    counter and the last section seq. Every written row gets the next seq,
+    which SSE clients resume from (Last-Event-ID).
+    """
+    existing = await db.watchanalysis.find_unique(where={"watchId": watch_id})
+    prev_sections = existing.sections if existing else 0
+    last_seq = existing.seq if existing else 0
+
+    # a legacy blob is split into rows once, then cleared
+    rows: Dict[str, Any] = {}
+    if existing and existing.aiJsonStr:
+        try:
+            rows.update(json.loads(existing.aiJsonStr))
+        except Exception:
+            pass
+    rows.update(fragment)
+
+    seqs: Dict[str, int] = {}
+    payloads: Dict[str, str] = {}
+    for key, value in rows.items():
+        last_seq += 1
+        seqs[key] = last_seq
+        payloads[key] = json.dumps(value, ensure_ascii=False)
+
+    # count from the stored keys + this write, so rows and counter commit together
+    stored = await db.query_raw('SELECT "section" FROM "AnalysisSection" WHERE "watchId" = ?', watch_id)
+    present = {r["section"] for r in stored} | set(rows)
+    sections = sum(1 for sec in SECTIONS if sec in present)
+
+    def write(batcher: Any) -> None:
+        for key, data_str in payloads.items():
+            batcher.analysissection.upsert(
+                where={"watchId_section": {"watchId": watch_id, "section": key}},
+                data={
+                    "create": {"watchId": watch_id, "section": key, "dataStr": data_str, "seq": seqs[key]},
+                    "update": {"dataStr": data_str, "seq": seqs[key]},
+                },
+            )
+        data = {"aiJsonStr": "", "sections": sections, "seq": last_seq}
+        batcher.watchanalysis.upsert(
+            where={"watchId": watch_id},
+            data={"create": {"watchId": watch_id, **data}, "update": data},
+        )
+
+    await WRITES.submit(write)
+    return sections, prev_sections, seqs
+
+# -----------------------------------------------------------------------------
+# Admin analytics rollups
+# -----------------------------------------------------------------------------
+# One DailyStats row per UTC day, bumped as events happen: a watch created,
+# a watch's first completed analysis (letter + create → complete latency), a
+# watch erroring. The first completion is stamped on the watch (completedAt,
+# completedLetter), so a reanalyze doesn't count the watch again and
+# scripts/rebuild_stats.py recomputes exactly what was bumped. DailyUser holds (day, userId) pairs so
+# uniqueUsers only counts a user's first watch of the day. Bumps are single
+# upserts and never fail the caller; scripts/rebuild_stats.py recomputes
+# everything from the Watch table.
+STATS_LETTERS = ("A", "B", "C", "D")
+
+def _stats_day(at: Optional[datetime] = None) -> str:
+    return (at or datetime.utcnow()).strftime("%Y-%m-%d")
+
+def _stats_letter_col(letter: Optional[str]) -> str:
+    return f"letter{letter}" if letter in STATS_LETTERS else "letterOther"
+
+async def _stats_bump(day: str, **deltas: float) -> None:
+    cols = list(deltas)
+    sql = (
+        'INSERT INTO "DailyStats" ("day", ' + ", ".join(f'"{c}"' for c in cols) + ") "
+        "VALUES (?" + ", ?" * len(cols) + ') ON CONFLICT("day") DO UPDATE SET '
+        + ", ".join(f'"{c}" = "{c}" + excluded."{c}"' for c in cols)
+    )
+    try:
+        await WRITES.submit(lambda b: b.execute_raw(sql, day, *deltas.values()))
+    except Exception as e:
+        print("[stats] bump failed:", day, deltas, e)
+
+async def _stats_on_created(user_id: Optional[int]) -> None:
+    day = _stats_day()
+    new_user = 0
+    if user_id is not None:
+        try:
+            new_user = await db.execute_raw(
+                'INSERT OR IGNORE INTO "DailyUser" ("day", "userId") VALUES (?, ?)', day, user_id,
             )
+        except Exception as e:
+            print("[stats] daily user insert failed:", e)
+    await _stats_bump(day, created=1, uniqueUsers=1 if new_user else 0)
+
+def _stats_first_completion(w: Any, now: Optional[datetime] = None) -> Optional[Dict[str, Any]]:
+    """Watch columns stamping its first completion; None if it was already counted."""
+    if getattr(w, "completedAt", None) is not None:
+        return None
+    if now is None:
+        now = datetime.now(timezone.utc) if w.createdAt.tzinfo else datetime.utcnow()
+    return {"completedAt": now, "completedLetter": w.overallLetter}
+
+def _stats_completion_row(created_at: datetime, completed_at: datetime, letter: Optional[str]) -> tuple[str, Dict[str, float]]:
+    """(day, DailyStats deltas) for one completed watch; shared with rebuild_stats."""
+    latency_ms = (completed_at - created_at).total_seconds() * 1000
+    return _stats_day(completed_at), {
+        "completed": 1, "latencyMsSum": max(0.0, latency_ms), _stats_letter_col(letter): 1,
+    }
+
+async def _stats_on_completed(w: Any) -> None:
+    first = _stats_first_completion(w)
+    if first is None:
+        return      # reanalysis of a watch already counted
+    await WRITES.submit(lambda b: b.watch.update_many(where={"id": w.id, "completedAt": None}, data=first))
+    day, deltas = _stats_completion_row(w.createdAt, first["completedAt"], first["completedLetter"])
+    await _stats_bump(day, **deltas)
+
+SEARCH_KEYS = ("name", "subtitle", "quick_facts", "overall")   # fragments that change WatchSearch
+# params: id, name, subtitle, conclusion (None keeps the stored one), id
+SEARCH_UPSERT_SQL = (
+    'INSERT OR REPLACE INTO "WatchSearch" (rowid, "name", "subtitle", "conclusion") '
+    'VALUES (?, ?, ?, COALESCE(?, (SELECT "conclusion" FROM "WatchSearch" WHERE rowid = ?), \'\'))'
+)
+
+async def _search_index(w: Any, fragment: Dict[str, Any]) -> None:
+    """
+    Rewrite the watch's WatchSearch row (rowid = watch id) from its columns + overall
+    conclusion, in one statement; a fragment without a conclusion keeps the stored one.
+    """
+    overall = fragment.get("overall")
+    conclusion = overall.get("conclusion") if isinstance(overall, dict) else None
+    if not isinstance(conclusion, str):
+        conclusion = None
+    try:
+        await WRITES.submit(lambda b: b.execute_raw(
+            SEARCH_UPSERT_SQL, w.id, w.name or "", w.subtitle or "", conclusion, w.id,
+        ))
+    except Exception as e:
+        print("[search] index update failed:", w.id, e)
 
+class RunSuperseded(Exception):
+    """The job producing a merge was cancelled/replaced (possibly by another worker)."""
+
+async def _merge_analysis_json(watch_id: int, fragment: Dict[str, Any], job_id: Optional[int] = None) -> None:
+    async with _lock_for(watch_id):                      # <-- swap in
+        # checked under the lock: _enqueue_analysis resets the watch under the same
+        # lock, so a superseded run (here or on another worker) can't merge after it
+        if job_id is not None and not await db.analysisjob.count(
+            where={"id": job_id, "status": "running", "workerId": WORKER_ID},
+        ):
+            raise RunSuperseded(f"job {job_id} for watch {watch_id} is no longer current")
+        if ANALYSIS_STORAGE == "blob":
+            sections, prev_sections, seqs = await _store_blob(watch_id, fragment)
+        else:
+            sections, prev_sections, seqs = await _store_sections(watch_id, fragment)
+
+        for sec in SECTIONS:
+            if sec in fragment:
+                _publish_watch(watch_id, {
+                    "type": "section", "section": sec, "data": fragment[sec], "seq": seqs.get(sec, 0),
+                    "raw": _dumps(fragment[sec]).decode(),   # encoded once, spliced by every subscriber
+                })
+
+        # denormalized list columns, written together with the status flip
+        watch_data = _summary_fields(fragment)
+        if sections != prev_sections:
+            watch_data["sections"] = sections
         if sections >= len(SECTIONS):
+            watch_data["status"] = "complete"
+        updated = None
+        if watch_data:
             try:
-                await db.watch.update(where={"id": watch_id}, data={"status": "complete"})
-            except Exception:
-                pass
+                await WRITES.submit(lambda b: b.watch.update(where={"id": watch_id}, data=watch_data))
+                completed_now = prev_sections < len(SECTIONS) <= sections
+                if completed_now or any(k in fragment for k in SEARCH_KEYS):
+                    updated = await db.watch.find_unique(where={"id": watch_id})
+            except Exception as e:
+                print("[merge] watch summary update failed:", watch_id, e)
 
-def _extract_finished_section(buf: str, key: str, start: int = 0):
-    # Find `"key"` then the first `{` or `[` after `:`
-    key_pat = f'"{key}"'
-    i = buf.find(key_pat, start)
-    if i == -1:
-        return None, start
-    j = buf.find(":", i + len(key_pat))
-    if j == -1:
-        return None, start
-    # skip spaces
-    k = j + 1
-    while k < len(buf) and buf[k] in " \n\r\t":
-        k += 1
-    if k >= len(buf) or buf[k] not in "{[":
-        return None, start
-
-    # match braces
-    open_ch = buf[k]
-    close_ch = "}" if open_ch == "{" else "]"
-    depth = 0
-    m = k
-    in_str = False
-    esc = False
-    while m < len(buf):
-        ch = buf[m]
-        if in_str:
-            if esc:
-                esc = False
-            elif ch == "\\":
-                esc = True
-            elif ch == '"':
-                in_str = False
-        else:
+        if updated is not None and any(k in fragment for k in SEARCH_KEYS):
+            await _search_index(updated, fragment)
+
+        # every section in; only a watch's first completion is counted
+        if updated is not None and prev_sections < len(SECTIONS) <= sections:
+            await _stats_on_completed(updated)
+
+        if sections >= len(SECTIONS):
+            _publish_watch(watch_id, {"type": "status", "status": "complete"})
+
+        if sections != prev_sections:
+            await _publish_user_change(
+                watch_id, "complete" if sections >= len(SECTIONS) else "processing", sections,
+            )
+
+_STRUCT_RE = re.compile(r'["{}\[\]]')   # chars that matter outside strings
+_STR_RE = re.compile(r'["\\]')          # chars that matter inside strings
+
+class SectionStreamParser:
+    """
+    Resumable tokenizer for the model's streamed JSON object.
+
+    feed() each text chunk as it arrives; it returns the top-level sections
+    (object/array values whose key is in `wanted`) that closed within that
+    chunk. State is kept between chunks so every byte is scanned once, and
+    only the section currently open is buffered.
+    """
+
+    def __init__(self, wanted: List[str]):
+        self.wanted = set(wanted)
+        self.parts: List[str] = []     # whole response, joined once in text()
+        self.depth = 0
+        self.in_str = False
+        self.esc = False
+        self.last_key: Optional[str] = None
+        self._key_parts: Optional[List[str]] = None   # collecting a depth-1 string
+        self._cap_key: Optional[str] = None           # section being captured
+        self._cap_parts: List[str] = []
+
+    def text(self) -> str:
+        return "".join(self.parts)
+
+    def feed(self, chunk: str) -> List[tuple[str, Any]]:
+        self.parts.append(chunk)
+        out: List[tuple[str, Any]] = []
+        cap_from = 0 if self._cap_key is not None else -1
+        key_from = 0 if self._key_parts is not None else -1
+        i, n = 0, len(chunk)
+
+        while i < n:
+            if self.in_str:
+                if self.esc:
+                    self.esc = False
+                    i += 1
+                    continue
+                m = _STR_RE.search(chunk, i)
+                if m is None:
+                    break
+                i = m.start()
+                if chunk[i] == "\\":
+                    self.esc = True
+                else:
+                    self.in_str = False
+                    if self._key_parts is not None:
+                        self._key_parts.append(chunk[key_from:i])
+                        self.last_key = "".join(self._key_parts)
+                        self._key_parts, key_from = None, -1
+                i += 1
+                continue
+
+            m = _STRUCT_RE.search(chunk, i)
+            if m is None:
+                break
+            i = m.start()
+            ch = chunk[i]
             if ch == '"':
-                in_str = True
-            elif ch == open_ch:
-                depth += 1
-            elif ch == close_ch:
-                depth -= 1
-                if depth == 0:
-                    # completed object/array
-                    block = buf[k:m+1]
+                self.in_str = True
+                if self.depth == 1:
+                    self._key_parts, key_from = [], i + 1
+            elif ch in "{[":
+                if self.depth == 1 and self.last_key in self.wanted:
+                    self._cap_key, self._cap_parts, cap_from = self.last_key, [], i
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth == 1 and self._cap_key is not None:
+                    self._cap_parts.append(chunk[cap_from:i + 1])
                     try:
-                        parsed = json.loads(block)
-                    except Exception:
-                        return None, start  # not yet valid JSON
-                    return parsed, m + 1
-        m += 1
-    return None, start
+                        out.append((self._cap_key, json.loads("".join(self._cap_parts))))
+                    except Exception as e:
+                        print("[parser] section parse failed:", self._cap_key, e)
+                    self._cap_key, self._cap_parts, cap_from = None, [], -1
+            i += 1
+
+        # carry partial state over to the next chunk
+        if self._cap_key is not None and cap_from >= 0:
+            self._cap_parts.append(chunk[cap_from:])
+        if self._key_parts is not None and key_from >= 0:
+            self._key_parts.append(chunk[key_from:])
+        return out
 
 # -----------------------------------------------------------------------------
 # APP Routes
@@ -434,6 +1589,9 @@ async def init_watch_presign(
         raise HTTPException(500, "S3 not configured")
 
     watch = await db.watch.create(data={"userId": principal["user_id"], "status": "processing"})
+    WATCH_OWNERS[watch.id] = principal["user_id"]
+    await _stats_on_created(principal["user_id"])
+    await _publish_user_change(watch.id, "processing", 0)
     items = []
     for i in range(count):
         ct = (contentTypes[i] if contentTypes and i < len(contentTypes) else "image/jpeg")
@@ -454,97 +1612,1079 @@ async def init_watch_presign(
 
     return {"watchId": watch.id, "uploads": items}
 
-async def _run_ai_analysis_strict(watch_id: int, keys: list[str]):
+# -----------------------------------------------------------------------------
+# Analysis result cache (content-addressed)
+# -----------------------------------------------------------------------------
+# Key = sha256(prompt/model version + sorted photo digests). Digests are S3
+# ETags, except under SSE-KMS where ETags aren't content hashes and the bytes
+# are hashed instead. Entries are evicted least-recently-hit first once the
+# stored JSON exceeds ANALYSIS_CACHE_MAX_BYTES.
+ANALYSIS_CACHE_ENABLED = os.getenv("ANALYSIS_CACHE_ENABLED", "1") == "1"
+ANALYSIS_CACHE_MAX_BYTES = int(os.getenv("ANALYSIS_CACHE_MAX_BYTES", str(256 * 1024 * 1024)))
+ANALYSIS_CACHE_STATS = {"hits": 0, "misses": 0, "stores": 0, "evictions": 0, "errors": 0}
+
+SYSTEM_PROMPT = "Return ONLY the strict JSON that matches the schema. No extra keys, no commentary."
+
+def _prompt_version(mode: str) -> str:
+    """What produced an analysis in `mode`: every planned request's model + prompt."""
+    raw = f"{mode}\n{SYSTEM_PROMPT}"
+    for model, keys in _plan_requests(mode):
+        raw += f"\n{model}\n{build_ai_prompt(keys)}"
+    return hashlib.sha256(raw.encode()).hexdigest()[:16]
+
+def _photo_digest(key: str) -> str:
+    if S3_REQUIRE_SSE != "aws:kms":
+        head = s3.head_object(Bucket=AWS_S3_BUCKET, Key=key)  # type: ignore[union-attr]
+        return "etag:" + head["ETag"].strip('"')
+    body = s3.get_object(Bucket=AWS_S3_BUCKET, Key=key)["Body"]  # type: ignore[union-attr]
+    h = hashlib.sha256()
+    for block in iter(lambda: body.read(1 << 20), b""):
+        h.update(block)
+    return "sha256:" + h.hexdigest()
+
+async def _analysis_cache_key(keys: list[str], mode: str) -> str:
+    digests = await asyncio.gather(*(asyncio.to_thread(_photo_digest, k) for k in keys))
+    raw = _prompt_version(mode) + "|" + "|".join(sorted(digests))
+    return hashlib.sha256(raw.encode()).hexdigest()
+
+async def _analysis_cache_get(cache_key: str) -> Optional[Dict[str, Any]]:
+    row = await db.analysiscache.find_unique(where={"cacheKey": cache_key})
+    if row is None:
+        ANALYSIS_CACHE_STATS["misses"] += 1
+        return None
+    ANALYSIS_CACHE_STATS["hits"] += 1
+    await WRITES.submit(lambda b: b.analysiscache.update_many(
+        where={"id": row.id},
+        data={"hits": {"increment": 1}, "lastHitAt": datetime.utcnow()},
+    ))
+    return json.loads(row.aiJsonStr)
+
+async def _analysis_cache_put(cache_key: str, obj: Dict[str, Any]) -> None:
+    payload = json.dumps(obj, ensure_ascii=False)
+    size = len(payload.encode())
+    await WRITES.submit(lambda b: b.analysiscache.upsert(
+        where={"cacheKey": cache_key},
+        data={
+            "create": {"cacheKey": cache_key, "aiJsonStr": payload, "bytes": size},
+            "update": {"aiJsonStr": payload, "bytes": size, "lastHitAt": datetime.utcnow()},
+        },
+    ))
+    ANALYSIS_CACHE_STATS["stores"] += 1
+    await _analysis_cache_evict()
+
+async def _analysis_cache_evict() -> None:
+    rows = await db.query_raw('SELECT COALESCE(SUM("bytes"), 0) AS total FROM "AnalysisCache"')
+    total = int(rows[0]["total"]) if rows else 0
+    while total > ANALYSIS_CACHE_MAX_BYTES:
+        oldest = await db.analysiscache.find_many(order={"lastHitAt": "asc"}, take=50)
+        if not oldest:
+            break
+        drop = []
+        for r in oldest:
+            if total <= ANALYSIS_CACHE_MAX_BYTES:
+                break
+            drop.append(r.id)
+            total -= r.bytes
+        await WRITES.submit(lambda b: b.analysiscache.delete_many(where={"id": {"in": drop}}))
+        ANALYSIS_CACHE_STATS["evictions"] += len(drop)
+
+# -----------------------------------------------------------------------------
+# Near-duplicate photo index (dHash + BK-tree)
+# -----------------------------------------------------------------------------
+# Every photo of a completed analysis is indexed by its 64-bit dHash. A new
+# watch whose photos are all within NEAR_DUP_MAX_DISTANCE bits of photos of
+# one completed watch either gets that watch's quick_facts as a provisional
+# event (NEAR_DUP_MODE=prefill; published only, never stored, superseded by the
+# real section) or its whole analysis (NEAR_DUP_MODE=serve). Off by default:
+# similar framing of different watches can land within a few bits.
+NEAR_DUP_MODE = os.getenv("NEAR_DUP_MODE", "off")              # "off" | "prefill" | "serve"
+NEAR_DUP_MAX_DISTANCE = int(os.getenv("NEAR_DUP_MAX_DISTANCE", "4"))
+NEAR_DUP_STATS = {"lookups": 0, "hits": 0, "served": 0, "prefilled": 0, "distanceSum": 0.0, "errors": 0}
+
+class BKTree:
+    """Metric tree over 64-bit hashes under Hamming distance."""
+
+    def __init__(self):
+        self.root: Optional[list] = None     # [hash, items, {distance: child}]
+        self.size = 0
+
+    def add(self, h: int, item: Any) -> None:
+        self.size += 1
+        if self.root is None:
+            self.root = [h, [item], {}]
+            return
+        node = self.root
+        while True:
+            d = (h ^ node[0]).bit_count()
+            if d == 0:
+                node[1].append(item)
+                return
+            child = node[2].get(d)
+            if child is None:
+                node[2][d] = [h, [item], {}]
+                return
+            node = child
+
+    def search(self, h: int, radius: int) -> List[tuple[int, Any]]:
+        out: List[tuple[int, Any]] = []
+        stack = [self.root] if self.root is not None else []
+        while stack:
+            node = stack.pop()
+            d = (h ^ node[0]).bit_count()
+            if d <= radius:
+                out.extend((d, item) for item in node[1])
+            for cd, child in node[2].items():
+                if d - radius <= cd <= d + radius:
+                    stack.append(child)
+        return out
+
+PHOTO_INDEX = BKTree()
+INDEXED_WATCHES: set[int] = set()
+
+def _fetch_photo_bytes(key: str) -> bytes:
+    return s3.get_object(Bucket=AWS_S3_BUCKET, Key=key)["Body"].read()  # type: ignore[union-attr]
+
+def _dhash(data: bytes) -> int:
+    img = Image.open(io.BytesIO(data))
+    img.draft("L", (64, 64))             # JPEG: decode at reduced scale
+    img = ImageOps.exif_transpose(img).convert("L").resize((9, 8), Image.Resampling.LANCZOS)
+    px = list(img.getdata())
+    bits = 0
+    for row in range(8):
+        for col in range(8):
+            bits = (bits << 1) | (px[row * 9 + col] > px[row * 9 + col + 1])
+    return bits
+
+async def _photo_dhashes(watch_id: int, keys: list[str], blobs: Optional[List[Optional[bytes]]] = None) -> List[int]:
+    """Hash each photo (in threads) and persist the hashes on the Photo rows."""
+    blobs = blobs or [None] * len(keys)
+    hashes = await asyncio.gather(*(
+        asyncio.to_thread(lambda k=k, b=b: _dhash(b if b is not None else _fetch_photo_bytes(k)))
+        for k, b in zip(keys, blobs)
+    ))
+    def write(b: Any) -> None:
+        for k, h in zip(keys, hashes):
+            b.photo.update_many(where={"watchId": watch_id, "key": k}, data={"dhash": f"{h:016x}"})
+    await WRITES.submit(write)
+    return list(hashes)
+
+def _index_watch(watch_id: int, hashes: List[int]) -> None:
+    if watch_id in INDEXED_WATCHES:
+        return
+    INDEXED_WATCHES.add(watch_id)
+    for h in hashes:
+        PHOTO_INDEX.add(h, watch_id)
+
+async def _build_photo_index() -> int:
+    cursor = 0
+    while True:
+        rows = await db.photo.find_many(
+            where={"id": {"gt": cursor}, "dhash": {"not": None}, "watch": {"is": {"status": "complete"}}},
+            order={"id": "asc"},
+            take=5000,
+        )
+        if not rows:
+            break
+        for p in rows:
+            PHOTO_INDEX.add(int(p.dhash, 16), p.watchId)
+            INDEXED_WATCHES.add(p.watchId)
+        cursor = rows[-1].id
+    return PHOTO_INDEX.size
+
+def _near_dup_match(hashes: List[int], exclude_watch: int) -> Optional[tuple[float, int]]:
+    """(avg distance, watch id) of the closest completed watch matching every photo."""
+    per_watch: Dict[int, List[int]] = {}
+    for h in hashes:
+        best: Dict[int, int] = {}
+        for d, wid in PHOTO_INDEX.search(h, NEAR_DUP_MAX_DISTANCE):
+            if wid != exclude_watch and d < best.get(wid, 65):
+                best[wid] = d
+        for wid, d in best.items():
+            per_watch.setdefault(wid, []).append(d)
+    candidates = [(sum(ds) / len(ds), wid) for wid, ds in per_watch.items() if len(ds) == len(hashes)]
+    return min(candidates) if candidates else None
+
+async def _near_dup_apply(watch_id: int, hashes: List[int], job_id: Optional[int] = None) -> bool:
+    """Prefill or serve from a near-duplicate. Returns True if the analysis was served."""
+    NEAR_DUP_STATS["lookups"] += 1
+    match = _near_dup_match(hashes, watch_id)
+    if match is None:
+        return False
+    dist, src_id = match
+    obj = await _load_analysis(src_id)
+    if _section_count(obj) < len(SECTIONS):
+        return False      # source was deleted or re-analysed meanwhile
+    NEAR_DUP_STATS["hits"] += 1
+    NEAR_DUP_STATS["distanceSum"] += dist
+    if NEAR_DUP_MODE == "serve":
+        NEAR_DUP_STATS["served"] += 1
+        await _merge_analysis_json(watch_id, obj, job_id)
+        print(f"[bg-analyze] served near-duplicate of {src_id} (d={dist:.1f}) for {watch_id}")
+        return True
+    NEAR_DUP_STATS["prefilled"] += 1
+    _publish_watch(watch_id, {
+        "type": "provisional", "section": "quick_facts", "data": obj["quick_facts"],
+        "raw": _dumps(obj["quick_facts"]).decode(), "sourceWatchId": src_id,
+    })
+    print(f"[bg-analyze] prefilled quick_facts from {src_id} (d={dist:.1f}) for {watch_id}")
+    return False
+
+# -----------------------------------------------------------------------------
+# Photo derivatives (vision input + list thumbnails)
+# -----------------------------------------------------------------------------
+# One decode per original, in a process pool, produces:
+#  - `<key>__v<edge>q<quality>.jpg`: downscaled, EXIF-stripped JPEG that the
+#    model sees instead of the raw photo (PREPROCESS_ENABLED)
+#  - `<key>__t<size>.<fmt>`: small thumbnails served by the list endpoints
+#    (THUMB_SIZES); Photo.thumbSizes records which ones exist
+# Derivatives are kicked off at finalize, awaited by the analysis worker, and
+# generated lazily when a list hits a photo without thumbnails.
+PREPROCESS_ENABLED = os.getenv("PREPROCESS_ENABLED", "1") == "1"
+VISION_MAX_EDGE = int(os.getenv("VISION_MAX_EDGE", "1536"))
+VISION_JPEG_QUALITY = int(os.getenv("VISION_JPEG_QUALITY", "85"))
+THUMB_SIZES = sorted(int(x) for x in os.getenv("THUMB_SIZES", "256,512").split(",") if x.strip())
+THUMB_FORMAT = os.getenv("THUMB_FORMAT", "webp")          # "webp" | "jpeg"
+THUMB_QUALITY = int(os.getenv("THUMB_QUALITY", "75"))
+PREPROCESS_WORKERS = int(os.getenv("PREPROCESS_WORKERS", "2"))
+PREPROCESS_STATS = {
+    "photos": 0, "reused": 0, "errors": 0, "bytesIn": 0, "bytesOut": 0, "fetchMs": 0.0, "processMs": 0.0,
+    "thumbs": 0, "thumbBytes": 0, "lazyThumbs": 0, "lazyThumbsSkipped": 0,
+}
+# originals whose derivative build failed (undecodable format, fetch error):
+# lists serve the original without re-fetching/re-rendering it until the retry
+# window passes, instead of redoing the failing work on every list request
+THUMB_RETRY_SECS = float(os.getenv("THUMB_RETRY_SECS", "3600"))
+THUMB_FAILED_MAX = 10000
+THUMB_FAILED: "OrderedDict[str, float]" = OrderedDict()
+# multi-worker: finalize on one worker and the job claim on another both want
+# the same derivatives; Photo.derivingUntil is a short lease so only one renders
+DERIVE_LEASE_SECS = float(os.getenv("DERIVE_LEASE_SECS", "30"))
+
+_preprocess_pool: Optional[ProcessPoolExecutor] = None
+DERIVATIVE_TASKS: dict[tuple[str, bool], asyncio.Task] = {}
+
+def _get_preprocess_pool() -> ProcessPoolExecutor:
+    global _preprocess_pool
+    if _preprocess_pool is None:
+        _preprocess_pool = ProcessPoolExecutor(max_workers=PREPROCESS_WORKERS)
+    return _preprocess_pool
+
+def _render_derivatives(data: bytes, vision_edge: int, vision_quality: int,
+                        thumb_sizes: List[int], thumb_format: str, thumb_quality: int) -> Dict[str, Any]:
+    """Runs in the process pool: orient, downscale, re-encode without metadata."""
+    img = Image.open(io.BytesIO(data))
+    img.draft("RGB", (max([vision_edge, *thumb_sizes]),) * 2)
+    img = ImageOps.exif_transpose(img)   # bake orientation in before EXIF is dropped
+    if img.mode != "RGB":
+        img = img.convert("RGB")
+
+    out: Dict[str, Any] = {"vision": None, "thumbs": {}}
+    if vision_edge:
+        v = img.copy()
+        v.thumbnail((vision_edge, vision_edge), Image.Resampling.LANCZOS)
+        buf = io.BytesIO()
+        v.save(buf, format="JPEG", quality=vision_quality, optimize=True)   # no exif= → stripped
+        out["vision"] = buf.getvalue()
+    for size in sorted(thumb_sizes, reverse=True):
+        img.thumbnail((size, size), Image.Resampling.LANCZOS)   # largest first, reuse the result
+        buf = io.BytesIO()
+        img.save(buf, format=thumb_format.upper(), quality=thumb_quality)
+        out["thumbs"][size] = buf.getvalue()
+    return out
+
+def _vision_key(key: str) -> str:
+    return f"{key.rsplit('.', 1)[0]}__v{VISION_MAX_EDGE}q{VISION_JPEG_QUALITY}.jpg"
+
+def _thumb_key(key: str, size: int) -> str:
+    ext = "webp" if THUMB_FORMAT == "webp" else "jpg"
+    return f"{key.rsplit('.', 1)[0]}__t{size}.{ext}"
+
+def _derived_keys(key: str) -> List[str]:
+    """Every derivative object we may have written for an original."""
+    return [_vision_key(key), *(_thumb_key(key, size) for size in THUMB_SIZES)]
+
+def _thumb_sizes_of(photo: Any) -> set[int]:
+    raw = getattr(photo, "thumbSizes", None) or ""
+    return {int(x) for x in raw.split(",") if x}
+
+def _put_derivative(key: str, data: bytes, content_type: str) -> None:
+    params: Dict[str, Any] = {"Bucket": AWS_S3_BUCKET, "Key": key, "Body": data, "ContentType": content_type}
+    if S3_REQUIRE_SSE == "aws:kms":
+        params["ServerSideEncryption"] = "aws:kms"
+        if S3_KMS_KEY_ID:
+            params["SSEKMSKeyId"] = S3_KMS_KEY_ID
+    else:
+        params["ServerSideEncryption"] = "AES256"
+    s3.put_object(**params)  # type: ignore[union-attr]
+
+def _get_if_exists(key: str) -> Optional[bytes]:
+    try:
+        return s3.get_object(Bucket=AWS_S3_BUCKET, Key=key)["Body"].read()  # type: ignore[union-attr]
+    except s3.exceptions.NoSuchKey:  # type: ignore[union-attr]
+        return None
+
+def _exists(key: str) -> bool:
+    try:
+        s3.head_object(Bucket=AWS_S3_BUCKET, Key=key)  # type: ignore[union-attr]
+        return True
+    except s3.exceptions.ClientError as e:  # type: ignore[union-attr]
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+
+async def _derivative_state(watch_id: int, key: str, vision: bool) -> tuple[Any, set[int], Optional[bytes]]:
+    """(photo row, thumbnail sizes present in S3, vision bytes if already written)."""
+    photo = await db.photo.find_first(where={"watchId": watch_id, "key": key})
+    have = _thumb_sizes_of(photo)
+    missing = [size for size in THUMB_SIZES if size not in have]
+    if missing:
+        # uploaded by another worker that hasn't recorded thumbSizes yet
+        found = await asyncio.gather(*(asyncio.to_thread(_exists, _thumb_key(key, size)) for size in missing))
+        have |= {size for size, ok in zip(missing, found) if ok}
+    existing = None
+    if vision and PREPROCESS_ENABLED:
+        existing = await asyncio.to_thread(_get_if_exists, _vision_key(key))
+    return photo, have, existing
+
+async def _claim_derivatives(photo_id: int) -> bool:
+    now = datetime.now(timezone.utc)
+    claimed = await db.photo.update_many(
+        where={"id": photo_id, "OR": [{"derivingUntil": None}, {"derivingUntil": {"lt": now}}]},
+        data={"derivingUntil": now + timedelta(seconds=DERIVE_LEASE_SECS)},
+    )
+    return claimed > 0
+
+async def _wait_derivatives(photo_id: int) -> None:
+    """Until the worker holding the lease finishes (clears it) or the lease lapses."""
+    deadline = time.monotonic() + DERIVE_LEASE_SECS
+    while time.monotonic() < deadline:
+        await asyncio.sleep(0.5)
+        p = await db.photo.find_unique(where={"id": photo_id})
+        if p is None or p.derivingUntil is None or p.derivingUntil < datetime.now(timezone.utc):
+            return
+
+async def _build_derivatives(watch_id: int, key: str, vision: bool) -> tuple[str, Optional[bytes]]:
+    """(key the model should see, its bytes). Falls back to the original on any error."""
+    try:
+        vkey = _vision_key(key)
+        photo, have, existing = await _derivative_state(watch_id, key, vision)
+        need_vision = vision and PREPROCESS_ENABLED and existing is None
+        want_thumbs = [size for size in THUMB_SIZES if size not in have]
+        claimed = False
+        if CLUSTER_RELAY and photo is not None and (need_vision or want_thumbs):
+            claimed = await _claim_derivatives(photo.id)
+            if not claimed:
+                # another worker is rendering these right now: use its output
+                await _wait_derivatives(photo.id)
+                photo, have, existing = await _derivative_state(watch_id, key, vision)
+                need_vision = vision and PREPROCESS_ENABLED and existing is None
+                want_thumbs = [size for size in THUMB_SIZES if size not in have]
+        if existing is not None:
+            PREPROCESS_STATS["reused"] += 1
+        recorded = _thumb_sizes_of(photo)
+        if not need_vision and not want_thumbs:
+            if have != recorded or claimed:
+                sizes = ",".join(str(x) for x in sorted(have))
+                await WRITES.submit(lambda b: b.photo.update_many(
+                    where={"watchId": watch_id, "key": key}, data={"thumbSizes": sizes, "derivingUntil": None},
+                ))
+            return (vkey, existing) if existing is not None else (key, None)
+
+        t0 = time.perf_counter()
+        original = await asyncio.to_thread(_fetch_photo_bytes, key)
+        t1 = time.perf_counter()
+        loop = asyncio.get_running_loop()
+        rendered = await loop.run_in_executor(
+            _get_preprocess_pool(), _render_derivatives, original,
+            VISION_MAX_EDGE if need_vision else 0, VISION_JPEG_QUALITY,
+            want_thumbs, THUMB_FORMAT, THUMB_QUALITY,
+        )
+        t2 = time.perf_counter()
+        PREPROCESS_STATS["fetchMs"] += (t1 - t0) * 1000
+        PREPROCESS_STATS["processMs"] += (t2 - t1) * 1000
+
+        thumb_ct = "image/webp" if THUMB_FORMAT == "webp" else "image/jpeg"
+        for size, data in rendered["thumbs"].items():
+            await asyncio.to_thread(_put_derivative, _thumb_key(key, size), data, thumb_ct)
+            PREPROCESS_STATS["thumbs"] += 1
+            PREPROCESS_STATS["thumbBytes"] += len(data)
+        small = rendered["vision"]
+        if small is not None:
+            await asyncio.to_thread(_put_derivative, vkey, small, "image/jpeg")
+        have |= set(rendered["thumbs"])
+        if have != recorded or claimed:
+            sizes = ",".join(str(x) for x in sorted(have))
+            await WRITES.submit(lambda b: b.photo.update_many(
+                where={"watchId": watch_id, "key": key}, data={"thumbSizes": sizes, "derivingUntil": None},
+            ))
+
+        if small is not None:
+            PREPROCESS_STATS["photos"] += 1
+            PREPROCESS_STATS["bytesIn"] += len(original)
+            PREPROCESS_STATS["bytesOut"] += len(small)
+            print(f"[preprocess] {key}: {len(original)} → {len(small)} bytes in {(t2 - t1) * 1000:.0f} ms")
+            return vkey, small
+        return (vkey, existing) if existing is not None else (key, None)
+    except Exception as e:
+        PREPROCESS_STATS["errors"] += 1
+        THUMB_FAILED[key] = time.monotonic()
+        THUMB_FAILED.move_to_end(key)
+        while len(THUMB_FAILED) > THUMB_FAILED_MAX:
+            THUMB_FAILED.popitem(last=False)
+        print("[preprocess] failed, using original:", key, e)
+        return key, None
+
+def _thumb_failed_recently(key: str) -> bool:
+    failed_at = THUMB_FAILED.get(key)
+    if failed_at is None:
+        return False
+    if time.monotonic() - failed_at >= THUMB_RETRY_SECS:
+        THUMB_FAILED.pop(key, None)
+        return False
+    return True
+
+def _ensure_derivatives(watch_id: int, key: str, vision: bool) -> asyncio.Task:
+    """One in-flight build per (key, vision); callers share the task."""
+    task_key = (key, vision)
+    task = DERIVATIVE_TASKS.get(task_key)
+    if task is None:
+        task = asyncio.create_task(_build_derivatives(watch_id, key, vision))
+        DERIVATIVE_TASKS[task_key] = task
+        task.add_done_callback(lambda _t, tk=task_key: DERIVATIVE_TASKS.pop(tk, None))
+    return task
+
+def _list_photo(p: Any, thumb: int) -> Dict[str, Any]:
+    """List payload for one photo: nearest thumbnail ≥ `thumb`, else the original."""
+    if not p.key:
+        return {"id": p.id}
+    have = _thumb_sizes_of(p)
+    size = next((x for x in THUMB_SIZES if x >= thumb), THUMB_SIZES[-1] if THUMB_SIZES else None)
+    try:
+        if size is not None and size in have:
+            return {"id": p.id, "url": _presign_get(_thumb_key(p.key, size), expires=60 * 10), "thumb": size}
+        if THUMB_SIZES and Image is not None:
+            if _thumb_failed_recently(p.key):
+                PREPROCESS_STATS["lazyThumbsSkipped"] += 1
+            else:
+                PREPROCESS_STATS["lazyThumbs"] += 1
+                _ensure_derivatives(p.watchId, p.key, vision=False)   # next list gets the thumbnail
+        return {"id": p.id, "url": _presign_get(p.key, expires=60 * 10)}
+    except Exception:
+        return {"id": p.id}
+
+# -----------------------------------------------------------------------------
+# Streaming analysis (single request or parallel section groups)
+# -----------------------------------------------------------------------------
+# "single" sends the whole schema in one request. "parallel" fans the schema
+# out over ANALYSIS_GROUPS, one concurrent request per group; the first group
+# (quick_facts/overall) runs on AI_FAST_MODEL so the headline lands early.
+# "ab" picks one of the two per analysis so MODE_LATENCY compares them on
+# the same traffic.
+ANALYSIS_MODE = os.getenv("ANALYSIS_MODE", "single")        # "single" | "parallel" | "ab"
+AI_FAST_MODEL = os.getenv("AI_FAST_MODEL", "gpt-4.1-mini")
+ANALYSIS_GROUPS: List[List[str]] = [
+    ["quick_facts", "name", "subtitle", "overall"],
+    ["brand_reputation", "movement_quality"],
+    ["materials_build", "maintenance_risks"],
+    ["value_for_money", "alternatives"],
+]
+TEMPERATURE_MODELS = {"gpt-4o", "gpt-4o-mini", "gpt-4.1", "gpt-4.1-mini", "gpt-4.1-nano"}
+MODE_LATENCY: Dict[str, Dict[str, float]] = {
+    m: {"runs": 0, "firstSectionMs": 0.0, "completeMs": 0.0} for m in ("single", "parallel")
+}
+
+# -----------------------------------------------------------------------------
+# Model routing + usage accounting
+# -----------------------------------------------------------------------------
+# MODEL_ROUTES="quick_facts=gpt-4.1-mini,brand_reputation=gpt-4.1-mini" sends
+# those sections to a cheaper model; unrouted keys use the request's default
+# (AI_MODEL, or AI_FAST_MODEL for the first parallel group). name/subtitle
+# follow quick_facts. Keys sharing a model are asked for in one request, so
+# no routes means the single-request path is unchanged.
+def _parse_routes(raw: str) -> Dict[str, str]:
+    routes: Dict[str, str] = {}
+    for part in raw.split(","):
+        if "=" in part:
+            key, model = (x.strip() for x in part.split("=", 1))
+            if key and model:
+                routes[key] = model
+    return routes
+
+MODEL_ROUTES = _parse_routes(os.getenv("MODEL_ROUTES", ""))
+
+# USD per 1M tokens (input, output); MODEL_PRICES='{"gpt-4.1": [2.0, 8.0]}' overrides
+MODEL_PRICES: Dict[str, List[float]] = {
+    "gpt-4.1": [2.00, 8.00],
+    "gpt-4.1-mini": [0.40, 1.60],
+    "gpt-4.1-nano": [0.10, 0.40],
+    "gpt-4o": [2.50, 10.00],
+    "gpt-4o-mini": [0.15, 0.60],
+}
+MODEL_PRICES.update(json.loads(os.getenv("MODEL_PRICES", "{}")))
+
+# model -> section -> running totals since process start
+USAGE_STATS: Dict[str, Dict[str, Dict[str, float]]] = {}
+
+def _route_model(key: str, default: str) -> str:
+    return MODEL_ROUTES.get("quick_facts" if key in ("name", "subtitle") else key, default)
+
+def _plan_requests(mode: str) -> List[tuple[str, List[str]]]:
+    """(model, keys) per OpenAI request for one analysis."""
+    groups = ANALYSIS_GROUPS if mode == "parallel" else [list(PROMPT_SCHEMA)]
+    plan: List[tuple[str, List[str]]] = []
+    for i, group in enumerate(groups):
+        default = AI_FAST_MODEL if (mode == "parallel" and i == 0) else AI_MODEL
+        by_model: Dict[str, List[str]] = {}
+        for key in group:
+            by_model.setdefault(_route_model(key, default), []).append(key)
+        plan.extend(by_model.items())
+    return plan
+
+def _usage_cost(model: str, prompt_tokens: float, completion_tokens: float) -> Optional[float]:
+    price = MODEL_PRICES.get(model)
+    if not price:
+        return None
+    return (prompt_tokens * price[0] + completion_tokens * price[1]) / 1_000_000
+
+def _usage_rows(
+    watch_id: int,
+    model: str,
+    usage: Any,
+    closed: Dict[str, tuple[float, int]],
+    t_req: float,
+) -> List[Dict[str, Any]]:
+    """
+    One AnalysisUsage row per key produced by a request. Prompt tokens (photos
+    included) are split evenly across its keys, completion tokens by each
+    key's share of the output; latency is request start → key closed.
+    Without a usage chunk the counts fall back to ~4 chars/token.
+    """
+    if not closed:
+        return []
+    out_chars = sum(n for _, n in closed.values()) or 1
+    prompt_total = getattr(usage, "prompt_tokens", None)
+    completion_total = getattr(usage, "completion_tokens", None)
+    estimated = prompt_total is None or completion_total is None
+    if completion_total is None:
+        completion_total = out_chars / 4
+
+    rows: List[Dict[str, Any]] = []
+    for key, (closed_at, chars) in closed.items():
+        prompt_tokens = (prompt_total or 0) / len(closed)
+        completion_tokens = completion_total * chars / out_chars
+        latency_ms = (closed_at - t_req) * 1000
+        cost = _usage_cost(model, prompt_tokens, completion_tokens)
+        rows.append({
+            "watchId": watch_id,
+            "section": key,
+            "model": model,
+            "promptTokens": round(prompt_tokens),
+            "completionTokens": round(completion_tokens),
+            "latencyMs": round(latency_ms),
+            "costUsd": cost,
+            "estimated": estimated,
+        })
+        st = USAGE_STATS.setdefault(model, {}).setdefault(
+            key, {"calls": 0, "promptTokens": 0, "completionTokens": 0, "latencyMs": 0.0, "costUsd": 0.0}
+        )
+        st["calls"] += 1
+        st["promptTokens"] += prompt_tokens
+        st["completionTokens"] += completion_tokens
+        st["latencyMs"] += latency_ms
+        st["costUsd"] += cost or 0.0
+    return rows
+
+async def _record_usage(
+    watch_id: int,
+    model: str,
+    usage: Any,
+    closed: Dict[str, tuple[float, int]],
+    t_req: float,
+) -> None:
+    rows = _usage_rows(watch_id, model, usage, closed, t_req)
+    if not rows:
+        return
+    def write(b: Any) -> None:
+        for row in rows:
+            b.analysisusage.create(data=row)
     try:
-        if not keys:
-            print("[bg-analyze] no keys"); return
+        await WRITES.submit(write)
+    except Exception as e:
+        print("[bg-analyze] usage record failed:", e)
+
+def _usage_snapshot() -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for model, sections in USAGE_STATS.items():
+        out[model] = {
+            key: {
+                "calls": st["calls"],
+                "avgPromptTokens": round(st["promptTokens"] / st["calls"]),
+                "avgCompletionTokens": round(st["completionTokens"] / st["calls"]),
+                "avgLatencyMs": round(st["latencyMs"] / st["calls"], 1),
+                "costUsd": round(st["costUsd"], 6),
+            }
+            for key, st in sections.items()
+        }
+    return out
 
-        vision_urls = [_presign_get(k, expires=60 * 30) for k in keys if k]
-        if not vision_urls:
-            print("[bg-analyze] no presigned urls"); return
+def _record_mode_latency(mode: str, timing: Dict[str, Optional[float]]) -> None:
+    stats = MODE_LATENCY[mode]
+    now = time.perf_counter()
+    stats["runs"] += 1
+    stats["firstSectionMs"] += ((timing["first"] or now) - timing["t0"]) * 1000
+    stats["completeMs"] += (now - timing["t0"]) * 1000
 
-        content = [{"type": "text", "text": build_ai_prompt()}]
-        for u in vision_urls:
-            content.append({"type": "image_url", "image_url": {"url": u}})
+async def _stream_sections(
+    watch_id: int,
+    image_urls: List[str],
+    keys: List[str],
+    model: str,
+    priority: int,
+    emitted: set[str],
+    timing: Dict[str, Optional[float]],
+    job_id: Optional[int] = None,
+) -> Dict[str, Any]:
+    """One streamed request for `keys`; sections are merged as they close. Returns the parsed object."""
+    content: List[Dict[str, Any]] = [{"type": "text", "text": build_ai_prompt(keys)}]
+    for u in image_urls:
+        content.append({"type": "image_url", "image_url": {"url": u}})
+
+    messages = [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": content},
+    ]
 
-        messages = [
-            {"role": "system", "content": "Return ONLY the strict JSON that matches the schema. No extra keys, no commentary."},
-            {"role": "user", "content": content},
-        ]
+    # ----- OpenAI stream under the adaptive limiter (slot held until the stream ends) -----
+    parser = SectionStreamParser([k for k in keys if k in SECTIONS])
 
-        # ----- OpenAI stream with concurrency limit, timeout, and retries -----
+    async with OAI_LIMITER.slot(priority):
         attempt, delay = 0, 0.8
         while True:
             try:
-                async with OAI_SEM:
-                    async with asyncio.timeout(90):  # hard cap per analysis start
-                        stream = await oclient.chat.completions.create(
-                            model=AI_MODEL,
-                            messages=messages,
-                            response_format={"type": "json_object"},
-                            stream=True,
-                            **({"temperature": 0.2} if AI_MODEL in {"gpt-4o", "gpt-4o-mini", "gpt-4.1"} else {}),
-                        )
+                t_req = time.perf_counter()
+                async with asyncio.timeout(90):  # hard cap per analysis start
+                    stream = await oclient.chat.completions.create(
+                        model=model,
+                        messages=messages,
+                        response_format={"type": "json_object"},
+                        stream=True,
+                        stream_options={"include_usage": True},
+                        **({"temperature": 0.2} if model in TEMPERATURE_MODELS else {}),
+                    )
                 break
             except Exception as e:
                 attempt += 1
                 if attempt >= 4:
-                    raise
+                    raise   # slot() counts a final overload
+                if _is_overload(e):
+                    OAI_LIMITER.on_overload()
                 await asyncio.sleep(delay + random.random() * 0.4)
                 delay = min(delay * 2.0, 6.0)
                 print(f"[bg-analyze] retry {attempt} for watch {watch_id}: {e}")
 
         # ----- Incremental section extraction + merge -----
-        buf = ""
-        emitted: set[str] = set()
-        scan_ptr = 0
-
-        async for chunk in stream:
+        got_first = False
+        usage = None
+        closed: Dict[str, tuple[float, int]] = {}   # key -> (closed at, output chars)
+        chunks = stream.__aiter__()
+        while True:
+            try:
+                async with asyncio.timeout(OAI_STREAM_IDLE_SECS):
+                    chunk = await anext(chunks)
+            except StopAsyncIteration:
+                break
+            except TimeoutError:
+                # stalled mid-stream: drop the connection; slot() counts the overload
+                print(f"[bg-analyze] stream idle {OAI_STREAM_IDLE_SECS:.0f}s for watch {watch_id}, aborting")
+                await stream.close()
+                raise
+            # the usage chunk (include_usage) arrives last with no choices
+            usage = getattr(chunk, "usage", None) or usage
             # be defensive about chunk shape
             choice = (chunk.choices[0] if getattr(chunk, "choices", None) else None)
             delta = getattr(choice, "delta", None)
             text = getattr(delta, "content", "") if delta else ""
             if not text:
                 continue
+            if not got_first:
+                got_first = True
+                OAI_LIMITER.observe_ttft(time.perf_counter() - t_req)
 
-            buf += text
-
-            # try to extract any not-yet-emitted sections
-            progress = True
-            while progress:
-                progress = False
-                for sec in SECTIONS:
-                    if sec in emitted:
-                        continue
-                    parsed, scan_ptr_new = _extract_finished_section(buf, sec, scan_ptr)
-                    if parsed is not None:
-                        await _merge_analysis_json(watch_id, {sec: parsed})
-                        emitted.add(sec)
-                        scan_ptr = scan_ptr_new
-                        print(f"[bg-analyze] emitted section '{sec}' for {watch_id}")
-                        progress = True
-
-        # end of stream → best-effort full parse
+            for sec, parsed in parser.feed(text):
+                if sec in emitted:
+                    continue
+                await _merge_analysis_json(watch_id, {sec: parsed}, job_id)
+                emitted.add(sec)
+                closed[sec] = (time.perf_counter(), len(json.dumps(parsed, ensure_ascii=False)))
+                if timing["first"] is None:
+                    timing["first"] = time.perf_counter()
+                print(f"[bg-analyze] emitted section '{sec}' for {watch_id}")
+
+    # end of stream → best-effort full parse; only requested keys not already merged
+    try:
+        full = json.loads(parser.text())
+    except Exception as e:
+        print("[bg-analyze] final parse error (partials already saved):", e)
+        full = {}
+    rest = {k: v for k, v in full.items() if k in keys and k not in emitted}
+    if rest:
+        await _merge_analysis_json(watch_id, rest, job_id)
+        emitted.update(rest)
+        done = time.perf_counter()
+        for k, v in rest.items():
+            closed[k] = (done, len(json.dumps(v, ensure_ascii=False)))
+    await _record_usage(watch_id, model, usage, closed, t_req)
+    return full
+
+async def _run_ai_analysis_strict(
+    watch_id: int, keys: list[str], priority: int = 0, bypass_cache: bool = False, job_id: Optional[int] = None,
+):
+    """
+    Stream one analysis into WatchAnalysis. Raises on failure; the job worker retries.
+    bypass_cache (admin reanalyze) skips the cache and near-dup reuse, always calls
+    the model, and overwrites the cache entry with the fresh result. With job_id,
+    every merge first checks the job is still this worker's running job.
+    """
+    if not keys:
+        raise RuntimeError("no photo keys to analyze")
+
+    # picked first: the cache key depends on which models the mode's plan uses
+    mode = ANALYSIS_MODE if ANALYSIS_MODE in ("single", "parallel") else random.choice(["single", "parallel"])
+
+    cache_key: Optional[str] = None
+    if ANALYSIS_CACHE_ENABLED:
+        try:
+            cache_key = await _analysis_cache_key([k for k in keys if k], mode)
+            cached = None if bypass_cache else await _analysis_cache_get(cache_key)
+        except Exception as e:
+            ANALYSIS_CACHE_STATS["errors"] += 1
+            print("[bg-analyze] cache lookup failed:", e)
+            cached = None
+        if cached is not None:
+            await _merge_analysis_json(watch_id, cached, job_id)
+            print("[bg-analyze] cache hit for", watch_id)
+            return
+
+    keys = [k for k in keys if k]
+    model_keys: List[str] = keys
+    blobs: List[Optional[bytes]] = [None] * len(keys)
+    if PREPROCESS_ENABLED and Image is not None:
+        prepared = await asyncio.gather(*(asyncio.shield(_ensure_derivatives(watch_id, k, vision=True)) for k in keys))
+        model_keys = [mk for mk, _ in prepared]
+        blobs = [b for _, b in prepared]
+
+    hashes: List[int] = []
+    if NEAR_DUP_MODE != "off" and Image is not None:
         try:
-            full = json.loads(buf)
-            await _merge_analysis_json(watch_id, full)
-            print("[bg-analyze] full JSON saved for", watch_id)
+            hashes = await _photo_dhashes(watch_id, keys, blobs)
+            if not bypass_cache and await _near_dup_apply(watch_id, hashes, job_id):
+                _index_watch(watch_id, hashes)
+                return
+        except RunSuperseded:
+            raise
         except Exception as e:
-            print("[bg-analyze] final parse error (partials already saved):", e)
+            NEAR_DUP_STATS["errors"] += 1
+            print("[bg-analyze] near-dup lookup failed:", e)
 
-    except Exception as e:
-        # mark the watch as errored so UI can react
+    vision_urls = [_presign_get(k, expires=60 * 30) for k in model_keys]
+    if not vision_urls:
+        raise RuntimeError("no presigned photo urls")
+
+    emitted: set[str] = set()
+    timing: Dict[str, Optional[float]] = {"t0": time.perf_counter(), "first": None}
+
+    plan = _plan_requests(mode)
+    if len(plan) == 1:
+        model, group = plan[0]
+        full = await _stream_sections(watch_id, vision_urls, group, model, priority, emitted, timing, job_id)
+    else:
+        results = await asyncio.gather(*(
+            _stream_sections(watch_id, vision_urls, group, model, priority, emitted, timing, job_id)
+            for model, group in plan
+        ), return_exceptions=True)
+        full: Dict[str, Any] = {}
+        for r in results:
+            if isinstance(r, dict):
+                full.update(r)
+        errors = [r for r in results if isinstance(r, BaseException)]
+        if errors:
+            raise errors[0]   # sections from the other requests are already merged
+
+    # a stream that ended short (truncated output, unparseable tail the extractor
+    # missed) must fail the job: "done" would leave the watch processing forever
+    missing = [sec for sec in SECTIONS if sec not in emitted]
+    if missing:
+        raise RuntimeError(f"analysis incomplete for watch {watch_id}: missing {', '.join(missing)}")
+
+    if _section_count(full) >= len(SECTIONS):
+        _record_mode_latency(mode, timing)
+        print(f"[bg-analyze] full JSON saved for {watch_id} ({mode})")
+        if hashes:
+            _index_watch(watch_id, hashes)
+        if cache_key:
+            try:
+                await _analysis_cache_put(cache_key, full)
+            except Exception as e:
+                ANALYSIS_CACHE_STATS["errors"] += 1
+                print("[bg-analyze] cache store failed:", e)
+
+async def _mark_watch_error(watch_id: int, err: Exception) -> None:
+    # mark the watch as errored so UI can react
+    try:
+        await WRITES.submit(lambda b: b.watch.update(where={"id": watch_id}, data={"status": "error"}))
+    except Exception:
+        pass
+    await _stats_bump(_stats_day(), errored=1)
+    _publish_watch(watch_id, {"type": "status", "status": "error"})
+    await _publish_user_change(watch_id, "error")
+    print("[bg-analyze] error:", err)
+
+# -----------------------------------------------------------------------------
+# Durable analysis job queue
+# -----------------------------------------------------------------------------
+# finalize enqueues an AnalysisJob row; a dispatcher claims jobs with a lease
+# (optimistic update_many on status+attempts) and runs up to ANALYSIS_WORKERS
+# at once. A crashed/restarted process leaves its lease to expire, after which
+# the job is claimed again.
+ANALYSIS_WORKERS = int(os.getenv("ANALYSIS_WORKERS", "16"))   # upper bound; OAI_LIMITER adapts below it
+JOB_LEASE_SECS = int(os.getenv("JOB_LEASE_SECS", "120"))
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_BACKOFF_BASE = float(os.getenv("JOB_BACKOFF_BASE", "5"))
+JOB_BACKOFF_MAX = float(os.getenv("JOB_BACKOFF_MAX", "300"))
+JOB_POLL_SECS = float(os.getenv("JOB_POLL_SECS", "2"))
+WORKER_ID = f"{socket.gethostname()}:{os.getpid()}"
+
+JOB_SLOTS = asyncio.Semaphore(ANALYSIS_WORKERS)
+JOB_WAKE = asyncio.Event()
+JOB_TASKS: set[asyncio.Task] = set()
+RUNNING_JOBS: dict[int, asyncio.Task] = {}
+JOB_SUPERSEDED: set[int] = set()
+SINGLEFLIGHT_STATS = {"attached": 0, "superseded": 0}
+_dispatcher_task: Optional[asyncio.Task] = None
+
+async def _reset_analysis(watch_id: int) -> None:
+    """
+    Drop a watch's stored sections (and legacy blob) before a fresh run, so the
+    section count restarts from 0 instead of completing on old-photo sections.
+    seq is kept: new sections keep counting up for SSE resume.
+    """
+    def write(b: Any) -> None:
+        b.analysissection.delete_many(where={"watchId": watch_id})
+        b.watchanalysis.update_many(where={"watchId": watch_id}, data={"aiJsonStr": "", "sections": 0})
+        b.watch.update(where={"id": watch_id}, data={"sections": 0, "status": "processing"})
+    await WRITES.submit(write)
+    _publish_watch(watch_id, {"type": "status", "status": "processing"})
+
+async def _enqueue_analysis(
+    watch_id: int, keys: list[str], priority: int = 0, reset: bool = True, bypass_cache: bool = False,
+) -> int:
+    """
+    Single-flight: a live job for the watch with the same photo keys is reused;
+    live jobs with different keys are cancelled and replaced. A new job starts
+    from a clean analysis unless `reset=False` (resuming an interrupted run of
+    the same photos). `bypass_cache` jobs never reuse a live job, which may be
+    about to replay the cache.
+    """
+    keys_json = json.dumps(keys)
+    async with _lock_for(watch_id):
+        live = await db.analysisjob.find_many(
+            where={"watchId": watch_id, "status": {"in": ["queued", "running"]}},
+            order={"id": "desc"},
+        )
+        same = [j for j in live if j.keysJson == keys_json and (j.bypassCache or not bypass_cache)]
+        if same:
+            job = same[0]
+            SINGLEFLIGHT_STATS["attached"] += 1
+            if priority > job.priority:
+                await db.analysisjob.update_many(
+                    where={"id": job.id, "status": "queued"}, data={"priority": priority},
+                )
+            print(f"[jobs] finalize for watch {watch_id} attached to live job {job.id}")
+            return job.id
+
+        if live:
+            await _cancel_jobs([j.id for j in live])
+            SINGLEFLIGHT_STATS["superseded"] += len(live)
+            print(f"[jobs] replacing jobs {[j.id for j in live]} for watch {watch_id}")
+
+        # under the watch lock, after the cancel: a superseded run's next merge
+        # (any worker) sees its job no longer running and stops instead of merging
+        if reset:
+            await _reset_analysis(watch_id)
+
+        job = await db.analysisjob.create(data={
+            "watchId": watch_id,
+            "keysJson": keys_json,
+            "priority": priority,
+            "bypassCache": bypass_cache,
+        })
+    JOB_WAKE.set()
+    return job.id
+
+async def _cancel_jobs(job_ids: list[int]) -> None:
+    await db.analysisjob.update_many(
+        where={"id": {"in": job_ids}, "status": {"in": ["queued", "running"]}},
+        data={"status": "cancelled", "leaseUntil": None},
+    )
+    # jobs running here stop now; other workers via the relay (or, without it,
+    # on their next lease renewal)
+    _cancel_local_jobs(job_ids)
+    _cluster_emit("cancel", {"jobIds": job_ids})
+
+def _cancel_local_jobs(job_ids: list[int]) -> None:
+    for job_id in job_ids:
+        task = RUNNING_JOBS.get(job_id)
+        if task is not None:
+            JOB_SUPERSEDED.add(job_id)
+            task.cancel()
+
+async def _claim_job() -> Any:
+    now = datetime.utcnow()
+    job = await db.analysisjob.find_first(
+        where={"OR": [
+            {"status": "queued", "runAfter": {"lte": now}},
+            {"status": "running", "leaseUntil": {"lt": now}},   # lease expired
+        ]},
+        order=[{"priority": "desc"}, {"id": "asc"}],
+    )
+    if job is None:
+        return None
+    claimed = await db.analysisjob.update_many(
+        where={"id": job.id, "status": job.status, "attempts": job.attempts},
+        data={
+            "status": "running",
+            "attempts": job.attempts + 1,
+            "leaseUntil": now + timedelta(seconds=JOB_LEASE_SECS),
+            "workerId": WORKER_ID,
+        },
+    )
+    return job if claimed == 1 else None
+
+async def _renew_lease(job_id: int, runner: asyncio.Task) -> None:
+    while True:
+        await asyncio.sleep(JOB_LEASE_SECS / 3)
+        try:
+            renewed = await db.analysisjob.update_many(
+                where={"id": job_id, "status": "running", "workerId": WORKER_ID},
+                data={"leaseUntil": datetime.utcnow() + timedelta(seconds=JOB_LEASE_SECS)},
+            )
+        except Exception as e:
+            print("[jobs] lease renew failed:", job_id, e)
+            continue
+        if renewed == 0:
+            # cancelled/superseded elsewhere (or lease taken over) → stop working on it
+            print(f"[jobs] job {job_id} no longer ours, stopping")
+            JOB_SUPERSEDED.add(job_id)
+            runner.cancel()
+            return
+
+def _owned(job: Any) -> Dict[str, Any]:
+    return {"id": job.id, "status": "running", "workerId": WORKER_ID}
+
+async def _run_job(job: Any) -> None:
+    attempts = job.attempts + 1
+    runner = asyncio.current_task()
+    RUNNING_JOBS[job.id] = runner
+    renew = asyncio.create_task(_renew_lease(job.id, runner))
+    try:
+        await _run_ai_analysis_strict(job.watchId, json.loads(job.keysJson), job.priority, job.bypassCache, job.id)
+        await db.analysisjob.update_many(
+            where=_owned(job),
+            data={"status": "done", "leaseUntil": None, "lastError": None},
+        )
+    except asyncio.CancelledError:
+        if job.id in JOB_SUPERSEDED:
+            JOB_SUPERSEDED.discard(job.id)
+            raise
+        # shutdown: hand the job back without burning an attempt
         try:
-            await db.watch.update(where={"id": watch_id}, data={"status": "error"})
+            await db.analysisjob.update_many(
+                where=_owned(job),
+                data={"status": "queued", "attempts": job.attempts, "leaseUntil": None},
+            )
         except Exception:
             pass
-        print("[bg-analyze] error:", e)
+        raise
+    except RunSuperseded as e:
+        # the row was already cancelled/taken over; nothing to record
+        print("[jobs]", e)
+    except Exception as e:
+        if attempts >= JOB_MAX_ATTEMPTS:
+            failed = await db.analysisjob.update_many(
+                where=_owned(job),
+                data={"status": "failed", "leaseUntil": None, "lastError": str(e)[:1000]},
+            )
+            if failed:
+                await _mark_watch_error(job.watchId, e)
+        else:
+            backoff = min(JOB_BACKOFF_BASE * 2 ** (attempts - 1), JOB_BACKOFF_MAX) + random.random()
+            await db.analysisjob.update_many(
+                where=_owned(job),
+                data={
+                    "status": "queued",
+                    "leaseUntil": None,
+                    "runAfter": datetime.utcnow() + timedelta(seconds=backoff),
+                    "lastError": str(e)[:1000],
+                },
+            )
+            print(f"[jobs] job {job.id} (watch {job.watchId}) attempt {attempts} failed, retry in {backoff:.1f}s: {e}")
+    finally:
+        renew.cancel()
+        RUNNING_JOBS.pop(job.id, None)
+        JOB_SLOTS.release()
+
+async def _job_dispatcher() -> None:
+    while True:
+        await JOB_SLOTS.acquire()
+        try:
+            job = await _claim_job()
+        except Exception as e:
+            print("[jobs] claim failed:", e)
+            job = None
+        if job is None:
+            JOB_SLOTS.release()
+            try:
+                await asyncio.wait_for(JOB_WAKE.wait(), timeout=JOB_POLL_SECS)
+            except asyncio.TimeoutError:
+                pass
+            JOB_WAKE.clear()
+            continue
+        task = asyncio.create_task(_run_job(job))
+        JOB_TASKS.add(task)
+        task.add_done_callback(JOB_TASKS.discard)
+
+async def _resume_stale_watches() -> int:
+    """Enqueue watches left in "processing" (with photos) that have no live job."""
+    active = await db.analysisjob.find_many(where={"status": {"in": ["queued", "running"]}})
+    active_ids = {j.watchId for j in active}
+    stale = await db.watch.find_many(
+        where={"status": "processing", "photos": {"some": {}}, "sections": {"lt": len(SECTIONS)}},
+        include={"photos": True},
+    )
+    resumed = 0
+    for w in stale:
+        if w.id in active_ids:
+            continue
+        keys = [p.key for p in sorted(w.photos, key=lambda p: p.index) if p.key]
+        if keys:
+            await _enqueue_analysis(w.id, keys, priority=PRIORITY_BACKGROUND, reset=False)
+            resumed += 1
+    if resumed:
+        print(f"[jobs] resumed {resumed} stale processing watches")
+    return resumed
+
+async def _job_counts() -> Dict[str, int]:
+    out: Dict[str, int] = {}
+    for st in ("queued", "running", "failed"):
+        out[st] = await db.analysisjob.count(where={"status": st})
+    out["active"] = len(JOB_TASKS)
+    out["workers"] = ANALYSIS_WORKERS
+    return out
 
 @app.post("/watches/{watch_id}/finalize")
 async def finalize_watch(
     watch_id: int,
     payload: FinalizePayload,
-    background: BackgroundTasks,
     principal: Principal = Depends(auth_principal),
 ):
     print("[finalize] incoming payload:", payload.model_dump())
@@ -558,6 +2698,26 @@ async def finalize_watch(
     saved = 0
     keys: list[str] = []
 
+    def photo_write(idx: int, k: str, mime: Optional[str]) -> Callable[[Any], Any]:
+        return lambda b: b.photo.upsert(
+            where={"watchId_index": {"watchId": watch_id, "index": idx}},
+            data={
+                "create": {
+                    "watchId": watch_id,
+                    "key": k,
+                    "index": idx,
+                    **({"mime": mime} if mime else {}),
+                },
+                "update": {
+                    "key": k,
+                    **({"mime": mime} if mime else {}),
+                },
+            },
+        )
+
+    # submitted together so the writer commits them in one transaction
+    pending: List[tuple[int, str]] = []
+    writes = []
     for idx, p in enumerate(payload.photos, start=1):
         k = p.get("key")
         mime = p.get("mime")
@@ -566,27 +2726,16 @@ async def finalize_watch(
         if not k:
             print("[finalize] skip: empty key")
             continue
-        try:
-            await db.photo.upsert(
-                where={"watchId_index": {"watchId": watch_id, "index": idx}},
-                data={
-                    "create": {
-                        "watchId": watch_id,
-                        "key": k,
-                        "index": idx,
-                        **({"mime": mime} if mime else {}),
-                    },
-                    "update": {
-                        "key": k,
-                        **({"mime": mime} if mime else {}),
-                    },
-                },
-            )
-            saved += 1
-            keys.append(k)
-            print(f"[finalize] upsert OK idx={idx}")
-        except Exception as e:
-            print(f"[finalize] upsert FAIL idx={idx} key={k!r} err={e!r}")
+        pending.append((idx, k))
+        writes.append(WRITES.submit(photo_write(idx, k, mime)))
+
+    for (idx, k), res in zip(pending, await asyncio.gather(*writes, return_exceptions=True)):
+        if isinstance(res, Exception):
+            print(f"[finalize] upsert FAIL idx={idx} key={k!r} err={res!r}")
+            continue
+        saved += 1
+        keys.append(k)
+        print(f"[finalize] upsert OK idx={idx}")
 
     print("[finalize] saved count:", saved)
     if saved == 0:
@@ -594,12 +2743,19 @@ async def finalize_watch(
 
     # mark processing for UI
     try:
-        await db.watch.update(where={"id": watch_id}, data={"status": "processing"})
+        await WRITES.submit(lambda b: b.watch.update(where={"id": watch_id}, data={"status": "processing"}))
     except Exception:
         pass
+    _invalidate_watches([watch_id])
+    await _publish_user_change(watch_id, "processing")
+
+    # queue streaming analysis with the collected keys (durable across restarts)
+    await _enqueue_analysis(watch_id, keys, priority=PRIORITY_INTERACTIVE)
 
-    # kick off streaming analysis with the collected keys
-    background.add_task(_run_ai_analysis_strict, watch_id, keys)
+    # start vision input + thumbnails now; the worker awaits the same tasks
+    if Image is not None and (PREPROCESS_ENABLED or THUMB_SIZES):
+        for k in keys:
+            _ensure_derivatives(watch_id, k, vision=True)
 
     # return record with short-lived signed URLs
     full = await db.watch.find_unique(where={"id": watch_id}, include={"photos": True})
@@ -620,9 +2776,33 @@ async def finalize_watch(
     out["photos"] = signed
     return out
 
-def sse(event: str, data: Dict[str, Any]) -> str:
-    payload = json.dumps(data, ensure_ascii=False)
-    return f"event: {event}\ndata: {payload}\n\n"
+SSE_IDLE_PING_SECS = 15.0     # comment keep-alive while waiting on the bus
+STREAM_IDLE_PING_SECS = 15.0  # comment keep-alive for idle /watches/stream
+
+def sse(event: str, data: Dict[str, Any], id: Optional[str] = None) -> str:
+    payload = _dumps(data).decode()
+    head = f"id: {id}\n" if id is not None else ""
+    return f"{head}event: {event}\ndata: {payload}\n\n"
+
+def sse_section(sec: str, seq: int, raw: str, id: Optional[str] = None) -> str:
+    """A "section" event with the stored JSON text spliced in (no re-encode)."""
+    name = json.dumps(sec)
+    head = f"id: {id}\n" if id is not None else ""
+    return f'{head}event: section\ndata: {{"section":{name},"seq":{seq},"data":{{{name}:{raw}}}}}\n\n'
+
+SSE_RETRY_MS = int(os.getenv("SSE_RETRY_MS", "2000"))   # client reconnect delay hint
+
+def _section_event_id(watch_id: int, seq: int) -> str:
+    return f"{watch_id}:{seq}"
+
+def _resume_seq(watch_id: int, last_event_id: Optional[str]) -> int:
+    """Seq to resume after from a Last-Event-ID ("<watchId>:<seq>"); 0 replays everything."""
+    if not last_event_id:
+        return 0
+    wid, _, seq = last_event_id.strip().partition(":")
+    if wid != str(watch_id) or not seq.isdigit():
+        return 0
+    return int(seq)
 
 def _order_sections(sections_param: Optional[str]) -> List[str]:
     ALL = SECTIONS[:]  # preserve canonical order
@@ -647,51 +2827,76 @@ async def analyze_stream(
     sections: Optional[str] = None,
     wait: int = Query(0, ge=0, le=1),
     timeout: int = Query(30, ge=1, le=120),
+    last_event_id: Optional[str] = Header(None, alias="Last-Event-ID"),
+    last_event_id_q: Optional[str] = Query(None, alias="lastEventId"),  # for clients that can't set headers
     principal: Principal = Depends(auth_principal),
 ):
     wanted = _order_sections(sections)
     sent: set[str] = set()
     start = time.perf_counter()
+    after = _resume_seq(watch_id, last_event_id or last_event_id_q)
 
     w = await db.watch.find_unique(where={"id": watch_id})
     if not w or w.userId != principal["user_id"]:
         raise HTTPException(404, "Watch not found")
 
     async def event_generator():
-        yield sse("start", {"watchId": watch_id, "sections": wanted})
-        while True:
-            if await request.is_disconnected():
-                break
-            wa = await db.watchanalysis.find_unique(where={"watchId": watch_id})
-            cached = {}
-            if wa and getattr(wa, "aiJsonStr", None):
-                try:
-                    cached = json.loads(wa.aiJsonStr)
-                except Exception:
-                    cached = {}
-
-            # emit any newly available sections
+        # subscribe before the catch-up read so nothing merged in between is lost
+        topic = _watch_topic(watch_id)
+        queue = BUS.subscribe(topic)
+        nonlocal after
+        try:
+            yield f"retry: {SSE_RETRY_MS}\n\n"
+            yield sse("start", {"watchId": watch_id, "sections": wanted, "resumedAfter": after})
+
+            # single catch-up read for sections persisted before we connected;
+            # sections at or below the resume seq were already delivered
+            cached, seqs, last_seq = await _load_analysis_seq(watch_id, only=wanted, raw=True)
+            if after > last_seq:
+                after = 0   # analysis was reset since that id was issued
             for sec in wanted:
-                if sec in sent:
+                raw = cached.get(sec)
+                if not raw or raw in _EMPTY_JSON:
                     continue
-                data_obj = cached.get(sec)
-                if data_obj:
-                    yield sse("section", {"section": sec, "data": {sec: data_obj}})
+                seq = seqs.get(sec, 0)
+                if after and 0 < seq <= after:
                     sent.add(sec)
+                    continue
+                yield sse_section(sec, seq, raw, id=_section_event_id(watch_id, seq) if seq else None)
+                sent.add(sec)
+
+            finished = w.status in ("complete", "error")
+            while wait and not finished and len(sent) < len(wanted):
+                remaining = timeout - (time.perf_counter() - start)
+                if remaining <= 0:
+                    break
+                try:
+                    ev = await asyncio.wait_for(queue.get(), timeout=min(remaining, SSE_IDLE_PING_SECS))
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
 
-            # exit conditions
-            if wait == 0:
-                break
-            if len(sent) == len(wanted):
-                break
-            if (time.perf_counter() - start) >= timeout:
-                break
-
-            # small sleep before next poll
-            yield sse("progress", {"pending": [s for s in wanted if s not in sent]})
-            await asyncio.sleep(0.5)
-
-        yield sse("done", {"ok": True})
+                if ev["type"] == "section":
+                    sec = ev["section"]
+                    seq = ev.get("seq", 0)
+                    if sec in wanted and sec not in sent and ev.get("data") and seq > after:
+                        yield sse_section(sec, seq, ev["raw"], id=_section_event_id(watch_id, seq) if seq else None)
+                        sent.add(sec)
+                elif ev["type"] == "provisional":
+                    # a near-duplicate's guess; not marked sent, the real section follows
+                    sec = ev["section"]
+                    if sec in wanted and sec not in sent:
+                        yield sse("provisional", {
+                            "section": sec, "data": {sec: ev["data"]}, "sourceWatchId": ev.get("sourceWatchId"),
+                        })
+                elif ev["type"] == "status" and ev["status"] in ("complete", "error"):
+                    finished = True
+
+            yield sse("done", {"ok": True})
+        finally:
+            BUS.unsubscribe(topic, queue)
 
     return StreamingResponse(
         event_generator(),
@@ -703,99 +2908,495 @@ async def analyze_stream(
 # Web application
 # -----------------------------------------------------------------------------
 
-def _extract(w) -> Dict[str, Any]:
-    """Pick name/year/score/price from cached AI JSON if present."""
-    name = None; year = None
-    letter = None; numeric = None
-    price_amt = None; price_cur = None
-    try:
-        obj = json.loads(w.analysis.aiJsonStr) if (w.analysis and w.analysis.aiJsonStr) else {}
-        qf = obj.get("quick_facts") or {}
-        vfm = obj.get("value_for_money") or {}
-        overall = obj.get("overall") or {}
-
-        name = obj.get("name") or qf.get("name")
-        y = qf.get("release_year")
-        year = int(y) if isinstance(y, int) else None
-
-        sc = overall.get("score") or {}
-        letter = sc.get("letter")
-        numeric = sc.get("numeric") if isinstance(sc.get("numeric"), (int, float)) else None
-
-        lp = vfm.get("list_price") or qf.get("list_price") or {}
-        price_amt = lp.get("amount")
-        price_cur = lp.get("currency")
-    except Exception:
-        pass
+def _price(amount: Any, currency: Optional[str]) -> Optional[Dict[str, Any]]:
+    if amount is None and not currency:
+        return None
+    if isinstance(amount, float) and amount.is_integer():
+        amount = int(amount)
+    return {"amount": amount, "currency": currency}
+
+def _summary(w) -> Dict[str, Any]:
+    """name/year/score/price for list and detail payloads, from the denormalized Watch columns."""
     return {
-        "name": name,
-        "year": year,
-        "overallLetter": letter,
-        "overallNumeric": numeric,
-        "price": {"amount": price_amt, "currency": price_cur} if (price_amt is not None or price_cur) else None,
+        "name": w.name,
+        "year": w.year,
+        "overallLetter": w.overallLetter,
+        "overallNumeric": w.overallNumeric,
+        "price": _price(w.priceAmount, w.priceCurrency),
     }
 
+# -----------------------------------------------------------------------------
+# List pages: keyset paging + sparse fieldsets + filters
+# -----------------------------------------------------------------------------
+# ?fields=id,userId,createdAt picks the payload keys. Only the needed Watch
+# columns are read with one narrow keyset query; photos (loaded and signed
+# only when "photos" is asked for) come from a second query over the page's
+# ids. Omitting fields keeps the full payload.
+#
+# Filters map onto indexed Watch columns (see the add_watch_search
+# migration): year, letter, minScore/maxScore, status, createdFrom/createdTo
+# (turned into an id range, ids grow with createdAt) and q, a prefix match
+# against the WatchSearch FTS5 index over name, subtitle and the overall
+# conclusion. Brand/model aren't filters: analyses don't produce them (they're
+# unique per (brand, model, year), so per-watch copies couldn't store them).
+LIST_FIELD_COLUMNS: Dict[str, List[str]] = {
+    "id": ["id"],
+    "createdAt": ["createdAt"],
+    "status": ["status"],
+    "sections": ["sections"],
+    "photos": [],                      # relation: loaded + signed only when asked for
+    "name": ["name"],
+    "year": ["year"],
+    "overallLetter": ["overallLetter"],
+    "overallNumeric": ["overallNumeric"],
+    "price": ["priceAmount", "priceCurrency"],
+    "userId": ["userId"],              # admin only
+}
+EXPORT_BATCH = 1000
+
+def _parse_fields(fields: Optional[str], is_admin: bool, allow_photos: bool = True) -> List[str]:
+    allowed = [f for f in LIST_FIELD_COLUMNS if (is_admin or f != "userId") and (allow_photos or f != "photos")]
+    if not fields:
+        return allowed
+    wanted = {f.strip() for f in fields.split(",") if f.strip()}
+    unknown = sorted(wanted - set(allowed))
+    if unknown:
+        raise HTTPException(400, f"Unknown fields: {', '.join(unknown)}")
+    return [f for f in allowed if f in wanted]
+
+def _iso(v: Any) -> Any:
+    if isinstance(v, datetime):
+        return v.isoformat()
+    if isinstance(v, (int, float)):   # SQLite DATETIME as epoch ms
+        return datetime.utcfromtimestamp(v / 1000).isoformat()
+    return v
+
+def _csv(v: Optional[str]) -> List[str]:
+    return [x.strip() for x in (v or "").split(",") if x.strip()]
+
+def _fts_query(q: str) -> Optional[str]:
+    # every word as a quoted prefix term, so user input can't inject FTS syntax
+    terms = re.findall(r"\w+", q)[:8]
+    return " ".join(f'"{t}"*' for t in terms) or None
+
+def _parse_date(v: Optional[str], name: str) -> Optional[datetime]:
+    if not v:
+        return None
+    try:
+        d = datetime.fromisoformat(v)
+    except ValueError:
+        raise HTTPException(400, f"{name} must be an ISO date")
+    return d if d.tzinfo else d.replace(tzinfo=timezone.utc)
+
+async def _list_filters(
+    year: Optional[int] = None,
+    letter: Optional[str] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    status: Optional[str] = None,
+    created_from: Optional[str] = None,
+    created_to: Optional[str] = None,
+    q: Optional[str] = None,
+) -> tuple[List[str], List[Any]]:
+    """SQL conditions + params over "Watch" for the list filters."""
+    conds: List[str] = []
+    params: List[Any] = []
+    if year is not None:
+        conds.append('"year" = ?')
+        params.append(year)
+    letters = [x.upper() for x in _csv(letter)]
+    if letters:
+        conds.append('"overallLetter" IN (' + ", ".join("?" * len(letters)) + ")")
+        params.extend(letters)
+    if min_score is not None:
+        conds.append('"overallNumeric" >= ?')
+        params.append(min_score)
+    if max_score is not None:
+        conds.append('"overallNumeric" <= ?')
+        params.append(max_score)
+    statuses = _csv(status)
+    if statuses:
+        conds.append('"status" IN (' + ", ".join("?" * len(statuses)) + ")")
+        params.extend(statuses)
+
+    # date range → id range (two indexed lookups; no DATETIME storage-format assumptions)
+    start = _parse_date(created_from, "createdFrom")
+    end = _parse_date(created_to, "createdTo")
+    if start:
+        first = await db.watch.find_first(where={"createdAt": {"gte": start}}, order={"createdAt": "asc"})
+        conds.append('"id" >= ?')
+        params.append(first.id if first else 2**62)
+    if end:
+        last = await db.watch.find_first(where={"createdAt": {"lte": end}}, order={"createdAt": "desc"})
+        conds.append('"id" <= ?')
+        params.append(last.id if last else 0)
+
+    match = _fts_query(q) if q else None
+    if match:
+        conds.append('"id" IN (SELECT rowid FROM "WatchSearch" WHERE "WatchSearch" MATCH ?)')
+        params.append(match)
+    return conds, params
+
+async def _list_rows_sparse(
+    user_id: Optional[int], cursor: Optional[int], limit: int, fields: List[str],
+    filters: Optional[tuple[List[str], List[Any]]] = None,
+) -> List[Dict[str, Any]]:
+    """Keyset page of Watch columns for `fields` (plus id/updatedAt for paging and ETags)."""
+    cols = ["id", "updatedAt"]
+    for f in fields:
+        cols.extend(c for c in LIST_FIELD_COLUMNS[f] if c not in cols)
+    conds: List[str] = list(filters[0]) if filters else []
+    params: List[Any] = list(filters[1]) if filters else []
+    if user_id is not None:
+        conds.append('"userId" = ?')
+        params.append(user_id)
+    if cursor:
+        conds.append('"id" < ?')
+        params.append(cursor)
+    sql = "SELECT " + ", ".join(f'"{c}"' for c in cols) + ' FROM "Watch"'
+    if conds:
+        sql += " WHERE " + " AND ".join(conds)
+    sql += ' ORDER BY "id" DESC LIMIT ?'
+    params.append(limit)
+    return await db.query_raw(sql, *params)
+
+def _sparse_item(r: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    out: Dict[str, Any] = {}
+    for f in fields:
+        if f == "photos":
+            continue   # filled by _list_page
+        if f == "price":
+            out["price"] = _price(r.get("priceAmount"), r.get("priceCurrency"))
+        elif f == "createdAt":
+            out["createdAt"] = _iso(r.get("createdAt"))
+        else:
+            out[f] = r.get(f)
+    return out
+
+async def _list_page(
+    request: Request,
+    user_id: Optional[int],
+    scope: Any,
+    cursor: Optional[int],
+    limit: int,
+    thumb: int,
+    fields: List[str],
+    filters: tuple[List[str], List[Any]],
+) -> Response:
+    rows = await _list_rows_sparse(user_id, cursor, limit + 1, fields, filters)
+    page = rows[:limit]
+
+    photos: Dict[int, List[Any]] = {}
+    if "photos" in fields and page:
+        for p in await db.photo.find_many(where={"watchId": {"in": [r["id"] for r in page]}}, order={"id": "asc"}):
+            photos.setdefault(p.watchId, []).append(p)
+
+    # rows are cheap to read; signing + rendering is what a 304 saves
+    etag = _etag(
+        "list", scope, cursor, limit, ",".join(fields), filters,
+        *((thumb, _url_epoch(60 * 10)) if "photos" in fields else ()),
+        *(f"{r['id']}:{r['updatedAt']}:{_photos_tag(photos.get(r['id']))}" for r in rows),
+    )
+    if _not_modified(request, etag):
+        return _etag_response(request, etag, b"")
+
+    items = []
+    for r in page:
+        item = _sparse_item(r, fields)
+        if "photos" in fields:
+            item["photos"] = [_list_photo(p, thumb) for p in photos.get(r["id"], [])]
+        items.append(item)
+    # cursor is exclusive ("id" < cursor): the last row emitted, not the lookahead row
+    next_cursor = page[-1]["id"] if len(rows) > limit else None
+    return _etag_response(request, etag, _render_json({"items": items, "nextCursor": next_cursor}))
+
 @app.get("/watches")
 async def list_watches(
+    request: Request,
     limit: int = Query(20, ge=1, le=100),
     cursor: Optional[int] = Query(None),
+    thumb: int = Query(256, ge=1, le=2048),
+    fields: Optional[str] = Query(None),
+    year: Optional[int] = Query(None),
+    letter: Optional[str] = Query(None, description="comma list, e.g. A,B"),
+    min_score: Optional[int] = Query(None, alias="minScore", ge=0, le=100),
+    max_score: Optional[int] = Query(None, alias="maxScore", ge=0, le=100),
+    status: Optional[str] = Query(None, description="comma list of statuses"),
+    created_from: Optional[str] = Query(None, alias="createdFrom"),
+    created_to: Optional[str] = Query(None, alias="createdTo"),
+    q: Optional[str] = Query(None, description="full-text: name, subtitle, conclusion"),
     principal: Principal = Depends(auth_principal),
     x_admin_key: Optional[str] = Header(default=None, alias="x-api-key"),
 ):
     # Admin override (same secret as /admin/*)
     is_admin = x_admin_key == os.getenv("ADMIN_API_KEY", "dev-secret")
 
-    # Scope
-    if is_admin:
-        where: Dict[str, Any] = {}
-    else:
-        where = {"userId": principal["user_id"]}
+    # Scope: admins see every watch (with owner), users their own
+    user_id = None if is_admin else principal["user_id"]
+    wanted = _parse_fields(fields, is_admin)
+    filters = await _list_filters(year, letter, min_score, max_score, status, created_from, created_to, q)
+    return await _list_page(request, user_id, "admin" if is_admin else user_id, cursor, limit, thumb, wanted, filters)
 
-    if cursor:
-        where = {**where, "id": {"lt": cursor}}
+@app.get("/watches/stream")
+async def stream_user_updates(request: Request, principal: Principal = Depends(auth_principal)):
+    user_id = principal["user_id"]
 
-    rows = await db.watch.find_many(
-        where=where,
-        order={"id": "desc"},
-        take=limit + 1,
-        include={"photos": True, "analysis": True},  # we’ll parse analysis JSON below
-    )
+    async def gen():
+        topic = _user_topic(user_id)
+        queue = BUS.subscribe(topic)
+        try:
+            yield sse("start", {"ok": True, "seq": USER_FEED_SEQ.get(user_id, 0)})
+
+            # one snapshot at connect time; afterwards only deltas from the feed
+            rows = await db.watch.find_many(
+                where={"userId": user_id},
+                order={"id": "desc"},
+                take=50,
+            )
+            for w in rows:
+                yield sse("progress", {"watchId": w.id, "sections": w.sections, "status": w.status})
+                if w.sections >= len(SECTIONS):
+                    yield sse("complete", {"watchId": w.id})
 
-    items: List[Dict[str, Any]] = []
-    for w in rows[:limit]:
-        # signed thumbs
-        thumbs = []
-        for p in w.photos:
+            while True:
+                try:
+                    ev = await asyncio.wait_for(queue.get(), timeout=STREAM_IDLE_PING_SECS)
+                except asyncio.TimeoutError:
+                    if await request.is_disconnected():
+                        break
+                    yield ": ping\n\n"
+                    continue
+                payload = {"watchId": ev["watchId"], "sections": ev["sections"], "status": ev["status"], "seq": ev["seq"]}
+                yield sse("progress", payload)
+                if ev["sections"] >= len(SECTIONS):
+                    yield sse("complete", {"watchId": ev["watchId"], "seq": ev["seq"]})
+        finally:
+            BUS.unsubscribe(topic, queue)
+
+    return StreamingResponse(gen(), media_type="text/event-stream",
+        headers={"Cache-Control":"no-cache","Connection":"keep-alive","X-Accel-Buffering":"no"})
+
+# -----------------------------------------------------------------------------
+# Multiplexed websocket: many watches (or all, for admin) per connection
+# -----------------------------------------------------------------------------
+# Auth: X-Client-Id + Authorization headers, or ?clientId=&apiKey= for
+# browsers; x-api-key header or ?adminKey= for admin. Client messages:
+#   {"op": "subscribe",   "watchIds": [1, 2] | "all", "after": {"1": 7}}
+#   {"op": "unsubscribe", "watchIds": [1] | "all"}
+#   {"op": "ping"}
+# Server messages: snapshot/section/status deltas tagged with watchId, plus
+# subscribed/unsubscribed/pong/error. Bus events land in one bounded send
+# queue per connection; when a slow client lets it fill, further events for
+# a watch are dropped and that watch gets a fresh snapshot once the queue
+# drains ("resync"), so clients never silently miss a section. Replies to the
+# client's own ops (subscribed/unsubscribed/pong/error) are never dropped:
+# they bypass the bound and go out ahead of queued events. Text frames only.
+WS_SEND_QUEUE_MAX = int(os.getenv("WS_SEND_QUEUE_MAX", "256"))
+WS_MAX_SUBSCRIPTIONS = int(os.getenv("WS_MAX_SUBSCRIPTIONS", "200"))
+WS_PING_SECS = 25.0
+WS_STATS = {"connections": 0, "open": 0, "sent": 0, "dropped": 0, "resyncs": 0, "duplicates": 0}
+WS_CONTROL_TYPES = {"subscribed", "unsubscribed", "pong", "error"}
+
+class _WsSendQueue(asyncio.Queue):
+    """Bounded send queue that records overflowed watch ids instead of raising."""
+
+    def __init__(self, maxsize: int):
+        super().__init__(maxsize=maxsize)
+        self.resync: set[int] = set()
+        self.control: deque = deque()   # control replies that arrived while full
+        self._last: Any = None
+
+    def put_nowait(self, item: Any) -> None:
+        if item is self._last:
+            # _publish_watch hands one event object to the watch topic and then
+            # ALL_WATCHES_TOPIC; a connection on both gets it back to back
+            WS_STATS["duplicates"] += 1
+            return
+        self._last = item
+        if self.full():
+            if isinstance(item, dict) and item.get("type") in WS_CONTROL_TYPES:
+                self.control.append(item)
+                return
+            WS_STATS["dropped"] += 1
+            if isinstance(item, dict) and "watchId" in item:
+                self.resync.add(item["watchId"])
+            return
+        super().put_nowait(item)
+
+async def _ws_principal(ws: WebSocket) -> tuple[Optional[Principal], bool]:
+    admin_key = ws.headers.get("x-api-key") or ws.query_params.get("adminKey")
+    if admin_key:
+        return None, admin_key == os.getenv("ADMIN_API_KEY", "dev-secret")
+    client_id = ws.headers.get("x-client-id") or ws.query_params.get("clientId")
+    api_key = ws.query_params.get("apiKey")
+    auth = ws.headers.get("authorization", "").split()
+    if len(auth) == 2 and auth[0].lower() == "bearer":
+        api_key = auth[1]
+    if not client_id or not api_key:
+        return None, False
+    principal = await _resolve_principal(client_id, api_key)
+    return principal, principal is not None
+
+def _ws_encode(msg: Dict[str, Any]) -> str:
+    """Section messages carry pre-encoded JSON in "raw"; splice it in as "data"."""
+    raw = msg.get("raw")
+    if raw is None:
+        return _dumps(msg).decode()
+    head = _dumps({k: v for k, v in msg.items() if k not in ("raw", "data")}).decode()
+    return head[:-1] + ',"data":' + raw + "}"
+
+async def _ws_snapshot(watch_id: int, after: int = 0) -> List[Dict[str, Any]]:
+    """Current status plus stored sections newer than `after`, as websocket messages."""
+    w = await db.watch.find_unique(where={"id": watch_id})
+    if not w:
+        return [{"type": "error", "watchId": watch_id, "message": "not found"}]
+    out: List[Dict[str, Any]] = [{"type": "snapshot", "watchId": watch_id, "status": w.status, "sections": w.sections}]
+    raws, seqs, last_seq = await _load_analysis_seq(watch_id, only=SECTIONS, raw=True)
+    if after > last_seq:
+        after = 0
+    for sec in SECTIONS:
+        seq = seqs.get(sec, 0)
+        if sec in raws and not (after and 0 < seq <= after):
+            out.append({"type": "section", "watchId": watch_id, "section": sec, "seq": seq, "raw": raws[sec]})
+    return out
+
+@app.websocket("/ws/watches")
+async def ws_watches(ws: WebSocket):
+    principal, ok = await _ws_principal(ws)
+    if not ok:
+        await ws.close(code=4401)
+        return
+    is_admin = principal is None
+    await ws.accept()
+    WS_STATS["connections"] += 1
+    WS_STATS["open"] += 1
+
+    queue = _WsSendQueue(WS_SEND_QUEUE_MAX)
+    topics: set[Any] = set()
+
+    async def sender():
+        while True:
+            if queue.control:
+                msg = queue.control.popleft()
+            else:
+                try:
+                    msg = await asyncio.wait_for(queue.get(), timeout=WS_PING_SECS)
+                except asyncio.TimeoutError:
+                    msg = {"type": "ping"}
+            await ws.send_text(_ws_encode(msg))
+            WS_STATS["sent"] += 1
+            if queue.empty() and queue.resync:
+                # caught up after an overflow: re-send full state for the watches that lost events
+                lagged, queue.resync = queue.resync, set()
+                WS_STATS["resyncs"] += len(lagged)
+                for watch_id in sorted(lagged):
+                    if ALL_WATCHES_TOPIC in topics or _watch_topic(watch_id) in topics:
+                        for m in await _ws_snapshot(watch_id):
+                            queue.put_nowait(m)
+
+    async def subscribe(ids: Any, after: Dict[str, Any]) -> None:
+        if ids == "all":
+            if not is_admin:
+                queue.put_nowait({"type": "error", "message": "forbidden"})
+                return
+            BUS.subscribe(ALL_WATCHES_TOPIC, queue)
+            topics.add(ALL_WATCHES_TOPIC)
+            queue.put_nowait({"type": "subscribed", "watchIds": "all"})
+            return
+        added: List[int] = []
+        for raw in ids if isinstance(ids, list) else []:
             try:
-                url = _presign_get(p.key, expires=60 * 10) if p.key else None
-                thumbs.append({"id": p.id, **({"url": url} if url else {})})
-            except Exception:
-                thumbs.append({"id": p.id})
-
-        sections = getattr(w.analysis, "sections", 0) if w.analysis else 0
-        enrich = _extract(w)
-
-        row = {
-            "id": w.id,   
-            "createdAt": w.createdAt.isoformat(),
-            "status": w.status,
-            "sections": sections,
-            "photos": thumbs,
-            **enrich,
-        }
-        # Optional: include owner for admin consumers
-        if is_admin:
-            row["userId"] = w.userId
-        items.append(row)
+                watch_id = int(raw)
+            except (TypeError, ValueError):
+                continue
+            topic = _watch_topic(watch_id)
+            if topic in topics:
+                continue
+            if len(topics) >= WS_MAX_SUBSCRIPTIONS:
+                queue.put_nowait({"type": "error", "watchId": watch_id, "message": "too many subscriptions"})
+                break
+            if not is_admin and await _watch_owner(watch_id) != principal["user_id"]:  # type: ignore[index]
+                queue.put_nowait({"type": "error", "watchId": watch_id, "message": "not found"})
+                continue
+            # subscribe before the snapshot read so nothing merged in between is lost
+            BUS.subscribe(topic, queue)
+            topics.add(topic)
+            added.append(watch_id)
+            try:
+                seq = int(after.get(str(watch_id), 0))
+            except (TypeError, ValueError):
+                seq = 0
+            for m in await _ws_snapshot(watch_id, seq):
+                queue.put_nowait(m)
+        queue.put_nowait({"type": "subscribed", "watchIds": added})
+
+    def unsubscribe(ids: Any) -> None:
+        if ids == "all":
+            for topic in topics:
+                BUS.unsubscribe(topic, queue)
+            topics.clear()
+            queue.put_nowait({"type": "unsubscribed", "watchIds": "all"})
+            return
+        removed: List[int] = []
+        for raw in ids if isinstance(ids, list) else []:
+            try:
+                topic = _watch_topic(int(raw))
+            except (TypeError, ValueError):
+                continue
+            if topic in topics:
+                BUS.unsubscribe(topic, queue)
+                topics.discard(topic)
+                removed.append(topic[1])
+        queue.put_nowait({"type": "unsubscribed", "watchIds": removed})
 
-    next_cursor = rows[-1].id if len(rows) > limit else None
-    return {"items": items, "nextCursor": next_cursor}
+    send_task = asyncio.create_task(sender())
+    try:
+        while True:
+            frame = await ws.receive()
+            if frame["type"] == "websocket.disconnect":
+                break
+            if frame.get("text") is None:
+                queue.put_nowait({"type": "error", "message": "binary frames are not supported"})
+                continue
+            try:
+                msg = json.loads(frame["text"])
+            except ValueError:
+                queue.put_nowait({"type": "error", "message": "invalid json"})
+                continue
+            op = msg.get("op") if isinstance(msg, dict) else None
+            if op == "subscribe":
+                await subscribe(msg.get("watchIds"), msg.get("after") or {})
+            elif op == "unsubscribe":
+                unsubscribe(msg.get("watchIds"))
+            elif op == "ping":
+                queue.put_nowait({"type": "pong"})
+            else:
+                queue.put_nowait({"type": "error", "message": f"unknown op {op!r}"})
+            if send_task.done():
+                break
+            if len(queue.control) > WS_SEND_QUEUE_MAX:
+                # sending ops faster than it reads the replies
+                await ws.close(code=1008)
+                break
+    except WebSocketDisconnect:
+        pass
+    finally:
+        send_task.cancel()
+        for topic in topics:
+            BUS.unsubscribe(topic, queue)
+        WS_STATS["open"] -= 1
 
 @app.get("/watches/{watch_id}")
-async def get_watch(watch_id: int):
+async def get_watch(watch_id: int, request: Request):
     if not (S3_ENABLED and s3 and AWS_S3_BUCKET):
         raise HTTPException(500, "S3 not configured")
 
+    # complete watches: replay the rendered body without touching the DB
+    epoch = _url_epoch(60 * 5)
+    cached = _response_cache_get(("watch", watch_id), epoch)
+    if cached:
+        return _etag_response(request, *cached)
+
     w = await db.watch.find_unique(
         where={"id": watch_id},
         include={"photos": True},
@@ -803,6 +3404,10 @@ async def get_watch(watch_id: int):
     if not w:
         raise HTTPException(404, "Watch not found")
 
+    etag = _etag("watch", w.id, w.updatedAt.isoformat(), _photos_tag(w.photos), epoch)
+    if _not_modified(request, etag):
+        return _etag_response(request, etag, b"")
+
     out = _serialize_watch(w)
 
     # Always presign S3 keys for client access
@@ -816,34 +3421,10 @@ async def get_watch(watch_id: int):
             signed_photos.append({**p})
     out["photos"] = signed_photos
 
-    return out
-
-@app.get("/watches/stream")
-async def stream_user_updates(request: Request, principal: Principal = Depends(auth_principal)):
-    async def gen():
-        yield sse("start", {"ok": True})
-        seen: Dict[int, int] = {}
-        while True:
-            if await request.is_disconnected():
-                break
-            rows = await db.watch.find_many(
-                where={"userId": principal["user_id"]},
-                include={"analysis": True},
-                order={"id": "desc"},
-                take=50,
-            )
-            for w in rows:
-                count = getattr(w.analysis, "sections", 0) if w.analysis else 0
-                prev = seen.get(w.id, -1)
-                if count != prev:
-                    seen[w.id] = count
-                    payload = {"watchId": w.id, "sections": count, "status": w.status}
-                    yield sse("progress", payload)
-                    if count >= len(SECTIONS):
-                        yield sse("complete", {"watchId": w.id})
-            await asyncio.sleep(1.0)
-    return StreamingResponse(gen(), media_type="text/event-stream",
-        headers={"Cache-Control":"no-cache","Connection":"keep-alive","X-Accel-Buffering":"no"})
+    body = _render_json(out)
+    if w.status == "complete":
+        _response_cache_put(("watch", watch_id), etag, body, epoch)
+    return _etag_response(request, etag, body)
 
 @app.post("/session/reset")
 async def reset_session(principal: Principal = Depends(auth_principal)):
@@ -852,84 +3433,105 @@ async def reset_session(principal: Principal = Depends(auth_principal)):
         where={"watch": {"userId": principal["user_id"]}},
         select={"key": True},
     )
+    keys = [k for ph in photos if ph["key"] for k in (ph["key"], *_derived_keys(ph["key"]))]
+    _presign_forget(keys)
     if S3_ENABLED and s3 and AWS_S3_BUCKET:
-        for ph in photos:
-            if ph["key"]:
-                try:
-                    s3.delete_object(Bucket=AWS_S3_BUCKET, Key=ph["key"])  # type: ignore
-                except Exception:
-                    pass
+        for k in keys:
+            try:
+                s3.delete_object(Bucket=AWS_S3_BUCKET, Key=k)  # type: ignore
+            except Exception:
+                pass
+    owned = await db.watch.find_many(where={"userId": principal["user_id"]})
     await db.watch.delete_many(where={"userId": principal["user_id"]})
+    _invalidate_watches([w.id for w in owned])
     await db.user.delete(where={"id": principal["user_id"]})
+    _forget_session(principal["client_id"], principal["user_id"])
     return {"ok": True}
 
 
 @app.get("/admin/watches")
 async def admin_list_watches(
+    request: Request,
     limit: int = Query(20, ge=1, le=100),
     cursor: Optional[int] = Query(None),
+    thumb: int = Query(256, ge=1, le=2048),
+    fields: Optional[str] = Query(None),
+    year: Optional[int] = Query(None),
+    letter: Optional[str] = Query(None, description="comma list, e.g. A,B"),
+    min_score: Optional[int] = Query(None, alias="minScore", ge=0, le=100),
+    max_score: Optional[int] = Query(None, alias="maxScore", ge=0, le=100),
+    status: Optional[str] = Query(None, description="comma list of statuses"),
+    created_from: Optional[str] = Query(None, alias="createdFrom"),
+    created_to: Optional[str] = Query(None, alias="createdTo"),
+    q: Optional[str] = Query(None, description="full-text: name, subtitle, conclusion"),
     x_admin_key: str = Header(alias="x-api-key"),
 ):
     # Same secret as admin_get_watch
     if x_admin_key != os.getenv("ADMIN_API_KEY", "dev-secret"):
         raise HTTPException(403, "Forbidden")
 
-    where: Dict[str, Any] = {}
-    if cursor:
-        where["id"] = {"lt": cursor}
-
-    rows = await db.watch.find_many(
-        where=where,
-        order={"id": "desc"},
-        take=limit + 1,
-        include={"photos": True, "analysis": True},
-    )
-
-    items: List[Dict[str, Any]] = []
-    for w in rows[:limit]:
-        # signed thumbs
-        thumbs = []
-        for p in w.photos:
-            try:
-                url = _presign_get(p.key, expires=60 * 10) if p.key else None
-                thumbs.append({"id": p.id, **({"url": url} if url else {})})
-            except Exception:
-                thumbs.append({"id": p.id})
-
-        sections = getattr(w.analysis, "sections", 0) if w.analysis else 0
-        enrich = _extract(w)   # name/year/score/price etc.
+    # userId is critical for the dashboard's unique-user graph
+    filters = await _list_filters(year, letter, min_score, max_score, status, created_from, created_to, q)
+    return await _list_page(request, None, "admin", cursor, limit, thumb, _parse_fields(fields, True), filters)
+
+@app.get("/admin/watches/export", dependencies=[Depends(require_admin)])
+async def admin_export_watches(
+    fields: Optional[str] = Query(None),
+    batch: int = Query(EXPORT_BATCH, ge=1, le=10000),
+    year: Optional[int] = Query(None),
+    letter: Optional[str] = Query(None, description="comma list, e.g. A,B"),
+    min_score: Optional[int] = Query(None, alias="minScore", ge=0, le=100),
+    max_score: Optional[int] = Query(None, alias="maxScore", ge=0, le=100),
+    status: Optional[str] = Query(None, description="comma list of statuses"),
+    created_from: Optional[str] = Query(None, alias="createdFrom"),
+    created_to: Optional[str] = Query(None, alias="createdTo"),
+    q: Optional[str] = Query(None, description="full-text: name, subtitle, conclusion"),
+):
+    """Whole table (or a filtered slice) as NDJSON, one compact row per line, in keyset batches (no photos)."""
+    wanted = _parse_fields(fields, True, allow_photos=False)
+    filters = await _list_filters(year, letter, min_score, max_score, status, created_from, created_to, q)
 
-        items.append(
-            {
-                "id": w.id,
-                "createdAt": w.createdAt.isoformat(),
-                "status": w.status,
-                "sections": sections,
-                "photos": thumbs,
-                "userId": w.userId,  # <-- critical for unique user graph
-                **enrich,
-            }
-        )
+    async def gen():
+        cursor: Optional[int] = None
+        while True:
+            rows = await _list_rows_sparse(None, cursor, batch, wanted, filters)
+            if not rows:
+                break
+            yield b"".join(_dumps(_sparse_item(r, wanted)) + b"\n" for r in rows)
+            if len(rows) < batch:
+                break
+            cursor = rows[-1]["id"]
 
-    next_cursor = rows[-1].id if len(rows) > limit else None
-    return {"items": items, "nextCursor": next_cursor}
+    return StreamingResponse(gen(), media_type="application/x-ndjson",
+        headers={"Content-Disposition": 'attachment; filename="watches.ndjson"'})
 
 @app.get("/admin/watches/{watch_id}")
 async def admin_get_watch(
     watch_id: int,
+    request: Request,
     x_admin_key: str = Header(alias="x-api-key"),
 ):
     if x_admin_key != os.getenv("ADMIN_API_KEY", "dev-secret"):
         raise HTTPException(403, "Forbidden")
 
+    epoch = _url_epoch(60 * 20)
+    cached = _response_cache_get(("admin_watch", watch_id), epoch)
+    if cached:
+        return _etag_response(request, *cached)
+
     # Load watch + relations (owner-independent)
     w = await db.watch.find_unique(
         where={"id": watch_id},
-        include={"photos": True, "analysis": True},
+        include={"photos": True, "analysis": True, "analysisSections": True},
     )
     if not w:
         raise HTTPException(404, "Watch not found")
 
+    seq = w.analysis.seq if w.analysis else 0
+    etag = _etag("admin_watch", w.id, w.updatedAt.isoformat(), seq, _photos_tag(w.photos), epoch)
+    if _not_modified(request, etag):
+        return _etag_response(request, etag, b"")
+
     out = _serialize_watch(w)
 
     # Presign S3 URLs
@@ -941,31 +3543,74 @@ async def admin_get_watch(
         for p in out.get("photos", [])
     ]
 
-    # Parse AI snapshot (if any)
-    ai_obj: Dict[str, Any] = {}
-    if w.analysis and getattr(w.analysis, "aiJsonStr", None):
-        try:
-            ai_obj = json.loads(w.analysis.aiJsonStr or "{}")
-        except Exception:
-            ai_obj = {}
+    # Stored AI JSON is spliced into the body as-is; only the key names are needed here
+    ai_raw = _analysis_raw(w.analysis, w.analysisSections)
+    if w.analysis and w.analysis.aiJsonStr:
+        ready = set(_analysis_obj(w.analysis, w.analysisSections))   # legacy blob
+    else:
+        ready = {r.section for r in w.analysisSections or []}
 
     # Progress/meta for admin
+    sections_ready = [s for s in SECTIONS if s in ready]
     out["progress"] = {
-        "sectionsReady": [s for s in SECTIONS if s in ai_obj],
-        "sectionsCount": _section_count(ai_obj),
+        "sectionsReady": sections_ready,
+        "sectionsCount": len(sections_ready),
         "sectionsTotal": len(SECTIONS),
         "status": w.status,
     }
 
     # Surface common fields (name/year/score/price) like list payload
-    out.update(_extract(w))
+    out.update(_summary(w))
 
     # For admin, include owner
     out["userId"] = w.userId
 
     # Include AI snapshot directly
-    out["ai"] = ai_obj
-    return out
+    body = _render_json(out, raw={"ai": ai_raw})
+    if w.status == "complete":
+        _response_cache_put(("admin_watch", watch_id), etag, body, epoch)
+    return _etag_response(request, etag, body)
+
+@app.get("/admin/watches/{watch_id}/usage", dependencies=[Depends(require_admin)])
+async def admin_watch_usage(watch_id: int):
+    rows = await db.analysisusage.find_many(where={"watchId": watch_id}, order={"id": "asc"})
+    sections: Dict[str, Dict[str, Any]] = {}
+    for r in rows:
+        # latest run wins per key; totals cover every run
+        sections[r.section] = {
+            "model": r.model,
+            "promptTokens": r.promptTokens,
+            "completionTokens": r.completionTokens,
+            "latencyMs": r.latencyMs,
+            "costUsd": r.costUsd,
+            "estimated": r.estimated,
+            "at": r.createdAt.isoformat(),
+        }
+    return {
+        "watchId": watch_id,
+        "sections": sections,
+        "totals": {
+            "records": len(rows),
+            "promptTokens": sum(r.promptTokens for r in rows),
+            "completionTokens": sum(r.completionTokens for r in rows),
+            "costUsd": round(sum(r.costUsd or 0.0 for r in rows), 6),
+        },
+    }
+
+@app.post("/admin/watches/{watch_id}/reanalyze", dependencies=[Depends(require_admin)])
+async def admin_reanalyze_watch(watch_id: int):
+    w = await db.watch.find_unique(where={"id": watch_id}, include={"photos": True})
+    if not w:
+        raise HTTPException(404, "Watch not found")
+    keys = [p.key for p in sorted(w.photos or [], key=lambda p: p.index) if p.key]
+    if not keys:
+        raise HTTPException(400, "No photos to analyze")
+
+    # admin re-runs queue behind interactive finalizes; the new job starts from
+    # cleared sections (status → processing) and asks the model again
+    job_id = await _enqueue_analysis(watch_id, keys, priority=PRIORITY_BACKGROUND, reset=True, bypass_cache=True)
+    await _publish_user_change(watch_id, "processing")
+    return {"ok": True, "jobId": job_id}
 
 @app.delete("/admin/watches/{watch_id}", dependencies=[Depends(require_admin)])
 async def admin_delete_watch(watch_id: int):
@@ -973,4 +3618,102 @@ async def admin_delete_watch(watch_id: int):
         await db.watch.delete(where={"id": watch_id})
     except Exception:
         raise HTTPException(404, "Watch not found")
-    return {"ok": True}
\ No newline at end of file
+    _invalidate_watches([watch_id])
+    return {"ok": True}
+
+@app.get("/admin/stats", dependencies=[Depends(require_admin)])
+async def admin_stats(days: int = Query(30, ge=1, le=366)):
+    """Per-day rollups for the last `days` UTC days (zero-filled), plus range totals."""
+    today = datetime.utcnow()
+    span = [_stats_day(today - timedelta(days=i)) for i in range(days - 1, -1, -1)]
+    rows = {r.day: r for r in await db.dailystats.find_many(where={"day": {"gte": span[0]}})}
+
+    out_days: List[Dict[str, Any]] = []
+    totals = {"created": 0, "completed": 0, "errored": 0, "latencyMsSum": 0.0,
+              "letters": {k: 0 for k in (*STATS_LETTERS, "other")}}
+    for day in span:
+        r = rows.get(day)
+        letters = {
+            **{k: getattr(r, f"letter{k}") if r else 0 for k in STATS_LETTERS},
+            "other": r.letterOther if r else 0,
+        }
+        item = {
+            "day": day,
+            "created": r.created if r else 0,
+            "completed": r.completed if r else 0,
+            "errored": r.errored if r else 0,
+            "uniqueUsers": r.uniqueUsers if r else 0,
+            "letters": letters,
+            "avgLatencyMs": round(r.latencyMsSum / r.completed, 1) if r and r.completed else None,
+        }
+        out_days.append(item)
+        for k in ("created", "completed", "errored"):
+            totals[k] += item[k]
+        totals["latencyMsSum"] += r.latencyMsSum if r else 0.0
+        for k, v in letters.items():
+            totals["letters"][k] += v
+
+    distinct = await db.query_raw(
+        'SELECT COUNT(DISTINCT "userId") AS n FROM "DailyUser" WHERE "day" >= ?', span[0],
+    )
+    latency_sum = totals.pop("latencyMsSum")
+    totals["uniqueUsers"] = int(distinct[0]["n"]) if distinct else 0
+    totals["avgLatencyMs"] = round(latency_sum / totals["completed"], 1) if totals["completed"] else None
+    return {"days": out_days, "totals": totals}
+
+@app.get("/admin/metrics", dependencies=[Depends(require_admin)])
+async def admin_metrics():
+    lookups = PRESIGN_STATS["hits"] + PRESIGN_STATS["misses"]
+    return {
+        "presign": {
+            **PRESIGN_STATS,
+            "size": len(PRESIGN_CACHE),
+            "hitRate": (PRESIGN_STATS["hits"] / lookups) if lookups else None,
+        },
+        "responseCache": {**RESPONSE_STATS, "size": len(RESPONSE_CACHE)},
+        "principalCache": {"size": len(PRINCIPAL_CACHE), "pendingHeartbeats": len(PENDING_HEARTBEATS)},
+        "jobs": await _job_counts(),
+        "singleFlight": SINGLEFLIGHT_STATS,
+        "writeQueue": WRITES.snapshot(),
+        "watchLocks": {**LOCK_STATS, "mode": WATCH_LOCK_MODE, "held": len(WATCH_LOCKS)},
+        "cluster": {**CLUSTER_STATS, "enabled": CLUSTER_RELAY, "outbox": len(CLUSTER_OUTBOX)},
+        "websocket": {**WS_STATS, "sendQueueMax": WS_SEND_QUEUE_MAX},
+        "openai": OAI_LIMITER.snapshot(),
+        "nearDup": {
+            **NEAR_DUP_STATS,
+            "mode": NEAR_DUP_MODE,
+            "maxDistance": NEAR_DUP_MAX_DISTANCE,
+            "indexSize": PHOTO_INDEX.size,
+            "hitRate": (NEAR_DUP_STATS["hits"] / NEAR_DUP_STATS["lookups"]) if NEAR_DUP_STATS["lookups"] else None,
+        },
+        "preprocess": {
+            **PREPROCESS_STATS,
+            "maxEdge": VISION_MAX_EDGE,
+            "quality": VISION_JPEG_QUALITY,
+            "failedOriginals": len(THUMB_FAILED),
+            "ratio": (PREPROCESS_STATS["bytesOut"] / PREPROCESS_STATS["bytesIn"]) if PREPROCESS_STATS["bytesIn"] else None,
+        },
+        "analysisModes": {
+            "mode": ANALYSIS_MODE,
+            **{
+                m: {
+                    "runs": st["runs"],
+                    "avgFirstSectionMs": round(st["firstSectionMs"] / st["runs"], 1) if st["runs"] else None,
+                    "avgCompleteMs": round(st["completeMs"] / st["runs"], 1) if st["runs"] else None,
+                }
+                for m, st in MODE_LATENCY.items()
+            },
+        },
+        "models": {
+            "default": AI_MODEL,
+            "fast": AI_FAST_MODEL,
+            "routes": MODEL_ROUTES,
+            "usage": _usage_snapshot(),
+        },
+        "analysisCache": {
+            **ANALYSIS_CACHE_STATS,
+            "openaiCallsSaved": ANALYSIS_CACHE_STATS["hits"],
+            "hitRate": (ANALYSIS_CACHE_STATS["hits"] / (ANALYSIS_CACHE_STATS["hits"] + ANALYSIS_CACHE_STATS["misses"]))
+                       if (ANALYSIS_CACHE_STATS["hits"] + ANALYSIS_CACHE_STATS["misses"]) else None,
+        },
+    }
@@ -0,0 +1,13 @@
+-- CreateTable
+CREATE TABLE "AnalysisSection" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "watchId" INTEGER NOT NULL,
+    "section" TEXT NOT NULL,
+    "dataStr" TEXT NOT NULL,
+    "createdAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" DATETIME NOT NULL,
+    CONSTRAINT "AnalysisSection_watchId_fkey" FOREIGN KEY ("watchId") REFERENCES "Watch" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "AnalysisSection_watchId_section_key" ON "AnalysisSection"("watchId", "section");
@@ -0,0 +1,4 @@
+-- AlterTable
+ALTER TABLE "Watch" ADD COLUMN "priceAmount" REAL;
+ALTER TABLE "Watch" ADD COLUMN "priceCurrency" TEXT;
+ALTER TABLE "Watch" ADD COLUMN "sections" INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,22 @@
+-- CreateTable
+CREATE TABLE "AnalysisJob" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "watchId" INTEGER NOT NULL,
+    "keysJson" TEXT NOT NULL,
+    "status" TEXT NOT NULL DEFAULT 'queued',
+    "priority" INTEGER NOT NULL DEFAULT 0,
+    "attempts" INTEGER NOT NULL DEFAULT 0,
+    "runAfter" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "leaseUntil" DATETIME,
+    "workerId" TEXT,
+    "lastError" TEXT,
+    "createdAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "updatedAt" DATETIME NOT NULL,
+    CONSTRAINT "AnalysisJob_watchId_fkey" FOREIGN KEY ("watchId") REFERENCES "Watch" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE INDEX "AnalysisJob_status_runAfter_idx" ON "AnalysisJob"("status", "runAfter");
+
+-- CreateIndex
+CREATE INDEX "AnalysisJob_watchId_idx" ON "AnalysisJob"("watchId");
@@ -0,0 +1,16 @@
+-- CreateTable
+CREATE TABLE "AnalysisCache" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "cacheKey" TEXT NOT NULL,
+    "aiJsonStr" TEXT NOT NULL,
+    "bytes" INTEGER NOT NULL,
+    "hits" INTEGER NOT NULL DEFAULT 0,
+    "createdAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    "lastHitAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- CreateIndex
+CREATE UNIQUE INDEX "AnalysisCache_cacheKey_key" ON "AnalysisCache"("cacheKey");
+
+-- CreateIndex
+CREATE INDEX "AnalysisCache_lastHitAt_idx" ON "AnalysisCache"("lastHitAt");
@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "Photo" ADD COLUMN "dhash" TEXT;
@@ -0,0 +1,20 @@
+-- CreateTable
+CREATE TABLE "AnalysisUsage" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "watchId" INTEGER NOT NULL,
+    "section" TEXT NOT NULL,
+    "model" TEXT NOT NULL,
+    "promptTokens" INTEGER NOT NULL,
+    "completionTokens" INTEGER NOT NULL,
+    "latencyMs" INTEGER NOT NULL,
+    "costUsd" REAL,
+    "estimated" BOOLEAN NOT NULL DEFAULT false,
+    "createdAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT "AnalysisUsage_watchId_fkey" FOREIGN KEY ("watchId") REFERENCES "Watch" ("id") ON DELETE CASCADE ON UPDATE CASCADE
+);
+
+-- CreateIndex
+CREATE INDEX "AnalysisUsage_watchId_idx" ON "AnalysisUsage"("watchId");
+
+-- CreateIndex
+CREATE INDEX "AnalysisUsage_model_section_idx" ON "AnalysisUsage"("model", "section");
@@ -0,0 +1,5 @@
+-- AlterTable
+ALTER TABLE "WatchAnalysis" ADD COLUMN "seq" INTEGER NOT NULL DEFAULT 0;
+
+-- AlterTable
+ALTER TABLE "AnalysisSection" ADD COLUMN "seq" INTEGER NOT NULL DEFAULT 0;
@@ -0,0 +1,22 @@
+-- CreateTable
+CREATE TABLE "DailyStats" (
+    "day" TEXT NOT NULL PRIMARY KEY,
+    "created" INTEGER NOT NULL DEFAULT 0,
+    "completed" INTEGER NOT NULL DEFAULT 0,
+    "errored" INTEGER NOT NULL DEFAULT 0,
+    "uniqueUsers" INTEGER NOT NULL DEFAULT 0,
+    "letterA" INTEGER NOT NULL DEFAULT 0,
+    "letterB" INTEGER NOT NULL DEFAULT 0,
+    "letterC" INTEGER NOT NULL DEFAULT 0,
+    "letterD" INTEGER NOT NULL DEFAULT 0,
+    "letterOther" INTEGER NOT NULL DEFAULT 0,
+    "latencyMsSum" REAL NOT NULL DEFAULT 0
+);
+
+-- CreateTable
+CREATE TABLE "DailyUser" (
+    "day" TEXT NOT NULL,
+    "userId" INTEGER NOT NULL,
+
+    PRIMARY KEY ("day", "userId")
+);
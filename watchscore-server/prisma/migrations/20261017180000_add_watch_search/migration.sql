@@ -0,0 +1,42 @@
+-- CreateIndex
+CREATE INDEX "Watch_overallLetter_idx" ON "Watch"("overallLetter");
+
+-- CreateIndex
+CREATE INDEX "Watch_overallNumeric_idx" ON "Watch"("overallNumeric");
+
+-- CreateIndex
+CREATE INDEX "Watch_year_idx" ON "Watch"("year");
+
+-- CreateIndex
+CREATE INDEX "Watch_createdAt_idx" ON "Watch"("createdAt");
+
+-- Case-insensitive brand/model lookups (not expressible in schema.prisma)
+CREATE INDEX "Watch_brand_model_nocase_idx" ON "Watch"("brand" COLLATE NOCASE, "model" COLLATE NOCASE);
+
+-- Full-text search over name, subtitle and the overall conclusion; rowid = Watch.id
+CREATE VIRTUAL TABLE "WatchSearch" USING fts5(
+    "name",
+    "subtitle",
+    "conclusion",
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+
+-- Deleting a watch drops its search row
+CREATE TRIGGER "Watch_search_delete" AFTER DELETE ON "Watch" BEGIN
+    DELETE FROM "WatchSearch" WHERE rowid = old."id";
+END;
+
+-- Backfill from existing analyses (section rows, or a legacy blob)
+INSERT INTO "WatchSearch" (rowid, "name", "subtitle", "conclusion")
+SELECT
+    w."id",
+    COALESCE(w."name", ''),
+    COALESCE(w."subtitle", ''),
+    COALESCE(
+        json_extract(s."dataStr", '$.conclusion'),
+        json_extract(NULLIF(a."aiJsonStr", ''), '$.overall.conclusion'),
+        ''
+    )
+FROM "Watch" w
+LEFT JOIN "AnalysisSection" s ON s."watchId" = w."id" AND s."section" = 'overall'
+LEFT JOIN "WatchAnalysis" a ON a."watchId" = w."id";
@@ -0,0 +1,6 @@
+-- CreateTable
+CREATE TABLE "WatchLock" (
+    "watchId" INTEGER NOT NULL PRIMARY KEY,
+    "owner" TEXT NOT NULL,
+    "expiresAt" BIGINT NOT NULL
+);
@@ -0,0 +1,2 @@
+-- brand/model list filters were dropped (nothing writes those columns)
+DROP INDEX IF EXISTS "Watch_brand_model_nocase_idx";
@@ -0,0 +1,2 @@
+-- AlterTable
+ALTER TABLE "AnalysisJob" ADD COLUMN "bypassCache" BOOLEAN NOT NULL DEFAULT false;
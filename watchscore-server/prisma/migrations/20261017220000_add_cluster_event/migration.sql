@@ -0,0 +1,11 @@
+-- CreateTable
+CREATE TABLE "ClusterEvent" (
+    "id" INTEGER NOT NULL PRIMARY KEY AUTOINCREMENT,
+    "origin" TEXT NOT NULL,
+    "kind" TEXT NOT NULL,
+    "payload" TEXT NOT NULL,
+    "createdAt" DATETIME NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- CreateIndex
+CREATE INDEX "ClusterEvent_createdAt_idx" ON "ClusterEvent"("createdAt");
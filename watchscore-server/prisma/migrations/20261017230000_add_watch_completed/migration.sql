@@ -0,0 +1,7 @@
+-- AlterTable
+ALTER TABLE "Watch" ADD COLUMN "completedAt" DATETIME;
+ALTER TABLE "Watch" ADD COLUMN "completedLetter" TEXT;
+
+-- Already-complete watches: best available stamp (what rebuild_stats used before)
+UPDATE "Watch" SET "completedAt" = "updatedAt", "completedLetter" = "overallLetter"
+WHERE "status" = 'complete' OR "sections" >= 8;
@@ -0,0 +1,65 @@
+# scripts/backfill_summary.py
+#
+# Fill the denormalized Watch summary columns (name, subtitle, year,
+# overallLetter, overallNumeric, priceAmount, priceCurrency, sections) from
+# stored analyses, for watches analysed before merges started writing them,
+# and rewrite each watch's WatchSearch row from them (the add_watch_search
+# migration indexed these watches while name/subtitle were still empty).
+#
+# Usage (from watchscore-server/):
+#   python scripts/backfill_summary.py [--batch 200]
+
+import argparse
+import asyncio
+import sys
+from pathlib import Path
+
+from prisma import Prisma
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.main import SEARCH_UPSERT_SQL, _analysis_obj, _section_count, _summary_fields  # noqa: E402
+
+
+async def main(batch: int):
+    db = Prisma()
+    await db.connect()
+
+    cursor = None
+    scanned = updated = 0
+    while True:
+        rows = await db.watch.find_many(
+            where={"id": {"gt": cursor}} if cursor else {},
+            order={"id": "asc"},
+            take=batch,
+            include={"analysis": True, "analysisSections": True},
+        )
+        if not rows:
+            break
+        for w in rows:
+            scanned += 1
+            if not w.analysis:
+                continue
+            obj = _analysis_obj(w.analysis, w.analysisSections)
+            data = _summary_fields(obj)
+            data["sections"] = _section_count(obj)
+            overall = obj.get("overall") if isinstance(obj.get("overall"), dict) else {}
+            conclusion = overall.get("conclusion") if isinstance(overall.get("conclusion"), str) else None
+            async with db.batch_() as batcher:
+                batcher.watch.update(where={"id": w.id}, data=data)
+                batcher.execute_raw(
+                    SEARCH_UPSERT_SQL, w.id,
+                    data.get("name", w.name) or "", data.get("subtitle", w.subtitle) or "", conclusion, w.id,
+                )
+            updated += 1
+        cursor = rows[-1].id
+        print(f"[Backfill] scanned {scanned}, updated {updated} (last id {cursor})")
+
+    await db.disconnect()
+    print("[Backfill] Done.")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=200)
+    asyncio.run(main(ap.parse_args().batch))
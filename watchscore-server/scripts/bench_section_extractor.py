@@ -0,0 +1,174 @@
+# scripts/bench_section_extractor.py
+#
+# Microbenchmark: streamed section extraction.
+# - "legacy": the old `buf += text` + `_extract_finished_section` rescan loop
+# - "stream": SectionStreamParser (app.main), one pass over each chunk
+#
+# Usage (from watchscore-server/):
+#   python scripts/bench_section_extractor.py [--chunk 6] [--pad 2000] [--runs 5]
+
+import argparse
+import json
+import random
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.main import SECTIONS, SectionStreamParser  # noqa: E402
+
+
+def legacy_extract(buf: str, key: str, start: int = 0):
+    # verbatim copy of the pre-streaming extractor
+    key_pat = f'"{key}"'
+    i = buf.find(key_pat, start)
+    if i == -1:
+        return None, start
+    j = buf.find(":", i + len(key_pat))
+    if j == -1:
+        return None, start
+    k = j + 1
+    while k < len(buf) and buf[k] in " \n\r\t":
+        k += 1
+    if k >= len(buf) or buf[k] not in "{[":
+        return None, start
+
+    open_ch = buf[k]
+    close_ch = "}" if open_ch == "{" else "]"
+    depth = 0
+    m = k
+    in_str = False
+    esc = False
+    while m < len(buf):
+        ch = buf[m]
+        if in_str:
+            if esc:
+                esc = False
+            elif ch == "\\":
+                esc = True
+            elif ch == '"':
+                in_str = False
+        else:
+            if ch == '"':
+                in_str = True
+            elif ch == open_ch:
+                depth += 1
+            elif ch == close_ch:
+                depth -= 1
+                if depth == 0:
+                    block = buf[k:m+1]
+                    try:
+                        parsed = json.loads(block)
+                    except Exception:
+                        return None, start
+                    return parsed, m + 1
+        m += 1
+    return None, start
+
+
+def run_legacy(chunks):
+    buf = ""
+    emitted = {}
+    scan_ptr = 0
+    for text in chunks:
+        buf += text
+        progress = True
+        while progress:
+            progress = False
+            for sec in SECTIONS:
+                if sec in emitted:
+                    continue
+                parsed, scan_ptr_new = legacy_extract(buf, sec, scan_ptr)
+                if parsed is not None:
+                    emitted[sec] = parsed
+                    scan_ptr = scan_ptr_new
+                    progress = True
+    return emitted, buf
+
+
+def run_stream(chunks):
+    parser = SectionStreamParser(SECTIONS)
+    emitted = {}
+    for text in chunks:
+        for sec, parsed in parser.feed(text):
+            emitted.setdefault(sec, parsed)
+    return emitted, parser.text()
+
+
+def sample_response(pad: int) -> str:
+    filler = ("Solid daily wearer, \"tool\" heritage; {brackets} [inside] strings \\ ok. " * 8)[:pad]
+    score = {"letter": "B", "numeric": 82}
+    obj = {
+        "quick_facts": {"name": "Seamaster 300M", "subtitle": filler, "movement_type": "automatic",
+                        "release_year": 2018, "list_price": {"amount": 5600, "currency": "USD"}},
+        "name": "Seamaster 300M",
+        "subtitle": "Diver 42mm",
+        "overall": {"conclusion": filler, "score": score},
+        "brand_reputation": {"type": "horology", "legacy": {"value": 175, "unit": "years"}, "score": score},
+        "movement_quality": {"type": "automatic", "accuracy": {"value": 5, "unit": "sec/day"},
+                             "reliability": {"label": "high"}, "score": score},
+        "materials_build": {"total_weight": {"value": 180, "unit": "g"}, "case_material": {"material": "steel"},
+                            "crystal": {"material": "sapphire"}, "build_quality": {"label": filler},
+                            "water_resistance": {"value": 300, "unit": "m"}, "score": score},
+        "maintenance_risks": {"service_interval": {"min": 5, "max": 8, "unit": "y"},
+                              "service_cost": {"min": 600, "max": 900, "currency": "USD"},
+                              "parts_availability": {"label": "high"}, "serviceability": {"raw": filler},
+                              "known_weak_points": [filler, "bezel insert"], "score": score},
+        "value_for_money": {"list_price": {"amount": 5600, "currency": "USD"},
+                            "resale_average": {"amount": 4200, "currency": "USD"},
+                            "market_liquidity": {"label": "high"},
+                            "holding_value": {"label": "good", "note": filler},
+                            "value_for_wearer": {"label": "high"}, "value_for_collector": {"label": "medium"},
+                            "spec_efficiency_note": {"label": "ok", "note": filler}, "score": score},
+        "alternatives": [{"model": f"Alt {i}", "movement": filler[:80], "price": {"amount": 1000 * i, "currency": "USD"}}
+                         for i in range(1, 6)],
+    }
+    return json.dumps(obj, ensure_ascii=False, indent=2)
+
+
+def chunked(text: str, avg: int, seed: int = 7):
+    rnd = random.Random(seed)
+    out, i = [], 0
+    while i < len(text):
+        n = max(1, int(rnd.expovariate(1 / avg)))
+        out.append(text[i:i + n])
+        i += n
+    return out
+
+
+def bench(fn, chunks, runs):
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        result = fn(chunks)
+        best = min(best, time.perf_counter() - t0)
+    return best, result
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--chunk", type=int, default=6, help="average chunk size in chars")
+    ap.add_argument("--pad", type=int, default=2000, help="filler length per long string")
+    ap.add_argument("--runs", type=int, default=5)
+    args = ap.parse_args()
+
+    text = sample_response(args.pad)
+    chunks = chunked(text, args.chunk)
+
+    t_legacy, (sec_legacy, buf_legacy) = bench(run_legacy, chunks, args.runs)
+    t_stream, (sec_stream, buf_stream) = bench(run_stream, chunks, args.runs)
+
+    assert buf_legacy == buf_stream == text
+    assert sec_stream == sec_legacy, "extractors disagree"
+    assert set(sec_stream) == set(SECTIONS)
+
+    print(f"response: {len(text)} chars in {len(chunks)} chunks (avg {args.chunk})")
+    print(f"legacy : {t_legacy * 1000:8.2f} ms")
+    print(f"stream : {t_stream * 1000:8.2f} ms")
+    print(f"speedup: {t_legacy / t_stream:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
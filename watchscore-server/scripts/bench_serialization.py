@@ -0,0 +1,150 @@
+# scripts/bench_serialization.py
+#
+# Microbenchmark: rendering the admin detail and list payloads.
+# - "before": parse stored analysis JSON, re-derive summary fields from it,
+#             then jsonable_encoder + json.dumps (FastAPI's default response)
+# - "after" : splice stored section JSON (_analysis_raw), summary from the
+#             Watch columns (_summary), _render_json (orjson when installed)
+# Rows are built in memory (no DB/S3), so only serialization is measured.
+#
+# Usage (from watchscore-server/):
+#   python scripts/bench_serialization.py [--items 50] [--runs 200]
+
+import argparse
+import json
+import sys
+import time
+from datetime import datetime, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from fastapi.encoders import jsonable_encoder  # noqa: E402
+
+import app.main as m  # noqa: E402
+from app.fake_openai import SAMPLE  # noqa: E402
+
+
+def make_watch(watch_id: int):
+    now = datetime.now(timezone.utc)
+    rows = [
+        SimpleNamespace(section=k, dataStr=json.dumps(v, ensure_ascii=False), seq=i)
+        for i, (k, v) in enumerate(SAMPLE.items(), 1)
+    ]
+    photos = [
+        SimpleNamespace(id=watch_id * 10 + i, key=None, url=None, mime="image/jpeg", index=i,
+                        createdAt=now, watchId=watch_id, thumbSizes=None)
+        for i in range(3)
+    ]
+    w = SimpleNamespace(
+        id=watch_id, userId=1, status="complete", sections=len(m.SECTIONS),
+        name="Fake Diver", subtitle="Automatic 40mm", brand=None, model=None, year=2020,
+        overallLetter="B", overallNumeric=80, priceAmount=1000.0, priceCurrency="USD",
+        createdAt=now, updatedAt=now, photos=photos,
+        analysis=SimpleNamespace(aiJsonStr="", sections=len(m.SECTIONS), seq=len(rows)),
+        analysisSections=rows,
+    )
+    w.model_dump = lambda: {
+        "id": w.id,
+        "photos": [vars(p) for p in photos],
+    }
+    return w
+
+
+def legacy_summary(obj):
+    # the old _extract: name/year/score/price re-derived from the parsed analysis
+    qf = obj.get("quick_facts") or {}
+    vfm = obj.get("value_for_money") or {}
+    sc = (obj.get("overall") or {}).get("score") or {}
+    lp = vfm.get("list_price") or qf.get("list_price") or {}
+    return {
+        "name": obj.get("name") or qf.get("name"),
+        "year": qf.get("release_year"),
+        "overallLetter": sc.get("letter"),
+        "overallNumeric": sc.get("numeric"),
+        "price": {"amount": lp.get("amount"), "currency": lp.get("currency")} if lp else None,
+    }
+
+
+def fastapi_default(obj) -> bytes:
+    return json.dumps(jsonable_encoder(obj), ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode()
+
+
+def detail_before(w) -> bytes:
+    out = m._serialize_watch(w)
+    ai_obj = m._analysis_obj(w.analysis, w.analysisSections)
+    out["progress"] = {
+        "sectionsReady": [s for s in m.SECTIONS if s in ai_obj],
+        "sectionsCount": m._section_count(ai_obj),
+        "sectionsTotal": len(m.SECTIONS),
+        "status": w.status,
+    }
+    out.update(legacy_summary(m._analysis_obj(w.analysis, w.analysisSections)))
+    out["userId"] = w.userId
+    out["ai"] = ai_obj
+    return fastapi_default(out)
+
+
+def detail_after(w) -> bytes:
+    out = m._serialize_watch(w)
+    ai_raw = m._analysis_raw(w.analysis, w.analysisSections)
+    ready = [s for s in m.SECTIONS if s in {r.section for r in w.analysisSections}]
+    out["progress"] = {
+        "sectionsReady": ready,
+        "sectionsCount": len(ready),
+        "sectionsTotal": len(m.SECTIONS),
+        "status": w.status,
+    }
+    out.update(m._summary(w))
+    out["userId"] = w.userId
+    return m._render_json(out, raw={"ai": ai_raw})
+
+
+def list_items(rows):
+    return {
+        "items": [
+            {"id": w.id, "createdAt": w.createdAt.isoformat(), "status": w.status, "sections": w.sections,
+             "photos": [{"id": p.id} for p in w.photos], "userId": w.userId, **m._summary(w)}
+            for w in rows
+        ],
+        "nextCursor": None,
+    }
+
+
+def bench(fn, arg, runs):
+    best = float("inf")
+    for _ in range(runs):
+        t0 = time.perf_counter()
+        fn(arg)
+        best = min(best, time.perf_counter() - t0)
+    return best
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--items", type=int, default=50, help="rows per list page")
+    ap.add_argument("--runs", type=int, default=200)
+    args = ap.parse_args()
+
+    w = make_watch(1)
+    rows = [make_watch(i) for i in range(1, args.items + 1)]
+
+    a, b = json.loads(detail_before(w)), json.loads(detail_after(w))
+    assert a["ai"] == b["ai"] and a["progress"] == b["progress"], "detail payloads disagree"
+    assert json.loads(fastapi_default(list_items(rows))) == json.loads(m._render_json(list_items(rows)))
+
+    print(f"encoder: {'orjson' if m.orjson is not None else 'stdlib json'}")
+    for label, before, after, arg in (
+        ("admin detail", detail_before, detail_after, w),
+        (f"list x{args.items}", lambda r: fastapi_default(list_items(r)), lambda r: m._render_json(list_items(r)), rows),
+    ):
+        t_before = bench(before, arg, args.runs)
+        t_after = bench(after, arg, args.runs)
+        print(f"{label:14s} before {t_before * 1e6:9.1f} us   after {t_after * 1e6:9.1f} us   "
+              f"speedup {t_before / t_after:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
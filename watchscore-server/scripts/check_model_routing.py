@@ -0,0 +1,83 @@
+# scripts/check_model_routing.py
+#
+# Offline check of MODEL_ROUTES: runs every planned request of one analysis
+# against the fake OpenAI stream (app/fake_openai.py) and prints which model
+# produced each key plus the usage rows that would be stored. Merges and
+# usage writes are captured in memory, so no DB, S3 or API key is needed.
+#
+# Usage (from watchscore-server/):
+#   python scripts/check_model_routing.py [--mode single|parallel] \
+#       [--routes "quick_facts=gpt-4.1-mini,brand_reputation=gpt-4.1-mini"]
+
+import argparse
+import asyncio
+import os
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--mode", choices=["single", "parallel"], default="single")
+    ap.add_argument("--routes", default="quick_facts=gpt-4.1-mini,brand_reputation=gpt-4.1-mini")
+    ap.add_argument("--images", type=int, default=3)
+    args = ap.parse_args()
+
+    os.environ["OPENAI_FAKE"] = "1"
+    os.environ["OPENAI_FAKE_DELAY"] = "0"
+    os.environ["MODEL_ROUTES"] = args.routes
+
+    import app.main as m  # noqa: E402  (env must be set first)
+
+    merged = {}
+    rows = []
+
+    async def capture_merge(watch_id, patch, job_id=None):
+        merged.update(patch)
+
+    async def capture_usage(watch_id, model, usage, closed, t_req):
+        rows.extend(m._usage_rows(watch_id, model, usage, closed, t_req))
+
+    m._merge_analysis_json = capture_merge
+    m._record_usage = capture_usage
+
+    plan = m._plan_requests(args.mode)
+    urls = [f"https://example.invalid/photo-{i}.jpg" for i in range(args.images)]
+    emitted = set()
+    timing = {"t0": time.perf_counter(), "first": None}
+
+    async def run():
+        return await asyncio.gather(*(
+            m._stream_sections(0, urls, keys, model, m.PRIORITY_BACKGROUND, emitted, timing)
+            for model, keys in plan
+        ))
+
+    asyncio.run(run())
+
+    calls = m.oclient.calls
+    assert len(calls) == len(plan), "one OpenAI call per planned request"
+    for (model, keys), call in zip(plan, calls):
+        assert call["model"] == model and call["keys"] == keys, (model, keys, call)
+    assert set(merged) == set(m.PROMPT_SCHEMA), "every schema key merged exactly once"
+    for key in m.PROMPT_SCHEMA:
+        want = m._route_model(key, m.AI_MODEL) if args.mode == "single" else None
+        got = next(r["model"] for r in rows if r["section"] == key)
+        assert want is None or got == want, (key, got, want)
+
+    print(f"mode={args.mode} routes={m.MODEL_ROUTES or '{}'}")
+    for model, keys in plan:
+        print(f"  request {model:14s} {', '.join(keys)}")
+    print(f"{'key':18s} {'model':14s} {'prompt':>7s} {'compl':>6s} {'cost $':>10s}")
+    for r in rows:
+        cost = f"{r['costUsd']:.6f}" if r["costUsd"] is not None else "—"
+        print(f"{r['section']:18s} {r['model']:14s} {r['promptTokens']:7d} {r['completionTokens']:6d} {cost:>10s}")
+    total = sum(r["costUsd"] or 0.0 for r in rows)
+    print(f"total est. cost: ${total:.6f}")
+
+
+if __name__ == "__main__":
+    main()
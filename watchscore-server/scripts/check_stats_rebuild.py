@@ -0,0 +1,74 @@
+# scripts/check_stats_rebuild.py
+#
+# Offline check that the incremental DailyStats bumps and
+# scripts/rebuild_stats.py agree when a watch is reanalysed: a watch completes
+# (letter B), is reanalysed the next day and completes again (letter A). The
+# live path stamps/counts only the first completion; the rebuild aggregates
+# the final Watch row. Both go through the same helpers as the API, with the
+# DB replaced by in-memory rows, so no DB is needed.
+#
+# Usage (from watchscore-server/):
+#   python scripts/check_stats_rebuild.py
+
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from types import SimpleNamespace
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import app.main as m  # noqa: E402
+
+
+def live_complete(w, letter, now, days):
+    """What _merge_analysis_json + _stats_on_completed do when every section is in."""
+    w.overallLetter = letter
+    w.status = "complete"
+    w.updatedAt = now
+    first = m._stats_first_completion(w, now=now)
+    if first is None:
+        return
+    for k, v in first.items():        # update_many(where completedAt = None)
+        setattr(w, k, v)
+    day, deltas = m._stats_completion_row(w.createdAt, first["completedAt"], first["completedLetter"])
+    for k, v in deltas.items():
+        days[day][k] += v
+
+
+def rebuild(rows):
+    """The completion part of rebuild_stats.main, over in-memory rows."""
+    days = defaultdict(lambda: defaultdict(float))
+    for w in rows:
+        if w.completedAt is not None:
+            day, deltas = m._stats_completion_row(w.createdAt, w.completedAt, w.completedLetter)
+            for k, v in deltas.items():
+                days[day][k] += v
+    return days
+
+
+def main():
+    t0 = datetime(2026, 10, 1, 12, 0, tzinfo=timezone.utc)
+    w = SimpleNamespace(id=1, createdAt=t0, updatedAt=t0, status="processing", overallLetter=None,
+                        completedAt=None, completedLetter=None)
+    live = defaultdict(lambda: defaultdict(float))
+
+    live_complete(w, "B", t0 + timedelta(minutes=2), live)
+    # admin reanalyze: sections reset, the watch completes again a day later
+    w.status = "processing"
+    live_complete(w, "A", t0 + timedelta(days=1, minutes=3), live)
+
+    rebuilt = rebuild([w])
+    as_dict = lambda d: {day: dict(v) for day, v in d.items()}   # noqa: E731
+    assert as_dict(live) == as_dict(rebuilt), (as_dict(live), as_dict(rebuilt))
+    assert sum(v["completed"] for v in live.values()) == 1, "a reanalysis must not count again"
+    assert live[m._stats_day(t0)]["letterB"] == 1, "the first completion's letter is kept"
+
+    for day, v in sorted(live.items()):
+        print(f"{day}  {dict(v)}")
+    print("incremental stats and rebuild agree after a reanalyze")
+
+
+if __name__ == "__main__":
+    main()
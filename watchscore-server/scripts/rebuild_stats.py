@@ -0,0 +1,77 @@
+# scripts/rebuild_stats.py
+#
+# Recompute the DailyStats / DailyUser rollups behind /admin/stats from the
+# Watch table (history from before the API maintained them, or after drift).
+# Completions come from the first-completion stamp (completedAt,
+# completedLetter) the API counts by, so a rebuild reproduces the live
+# numbers; reanalyses never count twice on either path
+# (scripts/check_stats_rebuild.py). Errors aren't stored as events: a watch
+# whose status is "error" counts once, on its updatedAt day. Bumps made while
+# this runs can be lost; run it with the API stopped or at a quiet time.
+#
+# Usage (from watchscore-server/):
+#   python scripts/rebuild_stats.py [--batch 500]
+
+import argparse
+import asyncio
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+from prisma import Prisma
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from app.main import _stats_completion_row, _stats_day  # noqa: E402
+
+
+async def main(batch: int):
+    db = Prisma()
+    await db.connect()
+
+    days = defaultdict(lambda: defaultdict(float))
+    users = defaultdict(set)
+
+    cursor = None
+    scanned = 0
+    while True:
+        rows = await db.watch.find_many(
+            where={"id": {"gt": cursor}} if cursor else {},
+            order={"id": "asc"},
+            take=batch,
+        )
+        if not rows:
+            break
+        for w in rows:
+            scanned += 1
+            created = _stats_day(w.createdAt)
+            days[created]["created"] += 1
+            if w.userId is not None:
+                users[created].add(w.userId)
+
+            if w.completedAt is not None:
+                day, deltas = _stats_completion_row(w.createdAt, w.completedAt, w.completedLetter)
+                for k, v in deltas.items():
+                    days[day][k] += v
+            elif w.status == "error":
+                days[_stats_day(w.updatedAt)]["errored"] += 1
+        cursor = rows[-1].id
+        print(f"[Stats] scanned {scanned} (last id {cursor})")
+
+    await db.dailyuser.delete_many()
+    await db.dailystats.delete_many()
+    for day in sorted(set(days) | set(users)):
+        data = {k: (v if k == "latencyMsSum" else int(v)) for k, v in days[day].items()}
+        await db.dailystats.create(data={"day": day, **data, "uniqueUsers": len(users[day])})
+        async with db.batch_() as batcher:
+            for user_id in users[day]:
+                batcher.dailyuser.create(data={"day": day, "userId": user_id})
+
+    await db.disconnect()
+    print(f"[Stats] Done: {len(days)} days rebuilt.")
+
+if __name__ == "__main__":
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--batch", type=int, default=500)
+    asyncio.run(main(ap.parse_args().batch))